@@ -0,0 +1,59 @@
+"""Benchmark the time to import formpy in a fresh interpreter.
+
+Each statement is run in a new python process so modules cached by earlier
+imports are not reused, run from the root of the repository with:
+
+    python benchmarks/bench_import.py --repeat 10
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import subprocess
+import sys
+
+STATEMENTS = {
+    "python": "pass",
+    "import formpy": "import formpy",
+    "import formpy.utils.schema": "import formpy.utils.schema",
+    "formpy.Template": "import formpy; formpy.Template",
+    "import formpy.form": "import formpy.form",
+}
+
+
+def time_import(statement: str, repeat: int) -> list[float]:
+    """Time statement in a new python process repeat times
+
+    Args:
+        statement (str): python statement to time
+        repeat (int): number of processes to time the statement in
+
+    Returns:
+        list[float]: time in seconds of each run
+    """
+    code = (
+        "import time; start = time.perf_counter(); "
+        f"{statement}; print(time.perf_counter() - start)"
+    )
+    return [
+        float(subprocess.check_output([sys.executable, "-c", code], text=True))
+        for _ in range(repeat)
+    ]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'statement':<30}{'median (ms)':>12}{'min (ms)':>12}")
+    for name, statement in STATEMENTS.items():
+        times = time_import(statement, args.repeat)
+        print(
+            f"{name:<30}{statistics.median(times) * 1000:>12.1f}"
+            f"{min(times) * 1000:>12.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Benchmark scoring a form with a thread pool against a single thread.
+
+Only the scoring of the answers is timed, the form is processed once, run
+from the root of the repository with:
+
+    python benchmarks/bench_scoring.py --repeat 20
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from formpy.form import Form
+from formpy.template import Template
+from formpy.utils.scoring import fill_ratios, weighted_fill_ratios
+
+TEMPLATE_JSON = "tests/oee_forms/test_template.json"
+TEMPLATE_JPG = "tests/oee_forms/test_template.jpg"
+FILLED_FORM = "tests/oee_forms/test_filled_form.jpg"
+
+
+def time_scoring(score, repeat: int) -> list[float]:
+    """Time calling score repeat times
+
+    Args:
+        score (Callable[[], np.ndarray]): function to score the form
+        repeat (int): number of times to call score
+
+    Returns:
+        list[float]: time in seconds of each call
+    """
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        score()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    template = Template.from_json(TEMPLATE_JSON, TEMPLATE_JPG)
+    template.refine_answer_centres()
+    img = Form.from_path(FILLED_FORM, template).img
+    coords, radius = template.answer_coords, template.circle_radius
+    origins, kernels = template.answer_kernels()
+
+    print(f"{os.cpu_count()} cpus, {len(coords)} answers")
+    print(f"{'workers':<10}{'circles (ms)':>14}{'kernels (ms)':>14}")
+    for workers in args.workers:
+        # thread pool shared by every call, as kept by Form
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            circle_times = time_scoring(
+                lambda: fill_ratios(img, coords, radius, workers, executor),
+                args.repeat,
+            )
+            kernel_times = time_scoring(
+                lambda: weighted_fill_ratios(img, origins, kernels, workers, executor),
+                args.repeat,
+            )
+        print(
+            f"{workers:<10}{statistics.median(circle_times) * 1000:>14.1f}"
+            f"{statistics.median(kernel_times) * 1000:>14.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
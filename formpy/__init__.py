@@ -0,0 +1,57 @@
+"""Read answers from scanned forms with optical mark recognition.
+
+The main classes are available from the top level namespace, e.g.
+``formpy.Template`` and ``formpy.Form``. They are imported on first use so
+``import formpy`` does not import OpenCV, which is only loaded once a class
+that processes images is used.
+"""
+from __future__ import annotations
+
+import importlib
+
+# same as typing.TYPE_CHECKING without importing typing on startup
+TYPE_CHECKING = False
+
+# map of lazily imported attribute to the module that defines it
+_LAZY_ATTRS = {
+    "Answer": "formpy.answer",
+    "BufferPool": "formpy.utils.buffers",
+    "Form": "formpy.form",
+    "Question": "formpy.question",
+    "ResultCache": "formpy.cache",
+    "ResultStore": "formpy.results",
+    "Template": "formpy.template",
+}
+
+__all__ = [
+    "Answer",
+    "BufferPool",
+    "Form",
+    "Question",
+    "ResultCache",
+    "ResultStore",
+    "Template",
+]
+
+if TYPE_CHECKING:
+    from formpy.answer import Answer
+    from formpy.cache import ResultCache
+    from formpy.form import Form
+    from formpy.question import Question
+    from formpy.results import ResultStore
+    from formpy.template import Template
+    from formpy.utils.buffers import BufferPool
+
+
+def __getattr__(name: str):
+    """Import the module of a top level attribute the first time it is used"""
+    if name not in _LAZY_ATTRS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_LAZY_ATTRS[name]), name)
+    # cache so __getattr__ is only called once for each attribute
+    globals()[name] = value
+    return value
+
+
+def __dir__() -> list[str]:
+    return sorted({*globals(), *_LAZY_ATTRS})
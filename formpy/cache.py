@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from formpy.template import Template
+
+
+class ResultCache:
+    """A class to cache the fill ratios of scored forms in a local SQLite
+    database, keyed by the content of the decoded page and the template, so
+    duplicate scans are not processed again. The least recently used results
+    are evicted once the cache is full.
+
+    A cache can be shared by many threads. Cache hits are recorded in memory
+    and their use order is written to the database in batches, so lookups do
+    not write to the database."""
+
+    # logical clock to order results by use, unlike timestamps it never ties
+    _NEXT_USE = "(SELECT COALESCE(MAX(last_used), 0) + 1 FROM results)"
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        max_entries: int | None = 100_000,
+        max_bytes: int | None = None,
+        flush_uses: int = 100,
+    ):
+        """Open or create the cache database
+
+        Args:
+            path (str, optional): path of the SQLite database file.
+            Defaults to ":memory:", and the cache is not persisted.
+            max_entries (int | None, optional): maximum number of results to
+            keep. Defaults to 100_000.
+            max_bytes (int | None, optional): maximum total size of the stored
+            fill ratios. Defaults to None, and the size is not limited.
+            flush_uses (int, optional): number of cache hits to record before
+            their use order is written to the database, it is also written
+            before results are stored or evicted and when the cache is closed.
+            Defaults to 100.
+        """
+        self.path = str(path)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.flush_uses = flush_uses
+        # keys of cache hits not yet written to the database, least recent first
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        if self.path != ":memory:":
+            # readers do not block the writer and commits only sync occasionally
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS results ("
+                "key TEXT PRIMARY KEY, "
+                "fill_ratios BLOB NOT NULL, "
+                "size INTEGER NOT NULL, "
+                "last_used INTEGER NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS results_last_used ON results (last_used)"
+            )
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def __repr__(self) -> str:
+        return f"ResultCache at {self.path} with {len(self)} results"
+
+    def __enter__(self) -> ResultCache:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @staticmethod
+    def key(img: np.ndarray, template: Template, scale: float = 1.0) -> str:
+        """Content address of a decoded page scored with template
+
+        Args:
+            img (np.ndarray): decoded page before it is processed e.g. from
+            documents.read_img()
+            template (Template): template the form is built from
+            scale (float, optional): scale the form is scored at, see
+            Form.__init__. Defaults to 1.0.
+
+        Returns:
+            str: hex digest of the page bytes, shape and data type, the
+            template fingerprint and the scale
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(
+            f"{img.shape}{img.dtype.str}{template.fingerprint}{scale}".encode()
+        )
+        digest.update(memoryview(np.ascontiguousarray(img)).cast("B"))
+        return digest.hexdigest()
+
+    def get(self, key: str) -> np.ndarray | None:
+        """Fill ratios stored for key, marking them as recently used
+
+        Args:
+            key (str): key from ResultCache.key()
+
+        Returns:
+            np.ndarray | None: fill ratio of each answer, None if the key is
+            not in the cache
+        """
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT fill_ratios FROM results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            # move to the end as the most recently used
+            self._uses.pop(key, None)
+            self._uses[key] = None
+            if len(self._uses) >= self.flush_uses:
+                with self._conn:
+                    self._flush_uses()
+        return np.frombuffer(row[0], dtype="<f8").astype("float64")
+
+    def put(self, key: str, fill_ratios: np.ndarray) -> None:
+        """Store the fill ratios of a form and evict the least recently used
+        results if the cache is full
+
+        Args:
+            key (str): key from ResultCache.key()
+            fill_ratios (np.ndarray): fill ratio of each answer e.g. from
+            Form.fill_ratios
+        """
+        data = np.ascontiguousarray(fill_ratios, dtype="<f8").tobytes()
+        with self._lock, self._conn:
+            self._flush_uses()
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO results VALUES (?, ?, ?, {self._NEXT_USE})",
+                (key, data, len(data)),
+            )
+            self._evict()
+
+    def _flush_uses(self) -> None:
+        # keys are updated in order so the last one is the most recently used
+        self._conn.executemany(
+            f"UPDATE results SET last_used = {self._NEXT_USE} WHERE key = ?",
+            [(key,) for key in self._uses],
+        )
+        self._uses.clear()
+
+    def _evict(self) -> None:
+        n_results, total_size = self._conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+        ).fetchone()
+        excess_results = 0
+        if self.max_entries is not None:
+            excess_results = max(n_results - self.max_entries, 0)
+        excess_size = 0
+        if self.max_bytes is not None:
+            excess_size = max(total_size - self.max_bytes, 0)
+        if excess_results == 0 and excess_size == 0:
+            return
+
+        # read the least recently used results until enough are evicted
+        evicted = []
+        rows = self._conn.execute("SELECT key, size FROM results ORDER BY last_used")
+        for key, size in rows:
+            if len(evicted) >= excess_results and excess_size <= 0:
+                break
+            evicted.append((key,))
+            excess_size -= size
+        rows.close()
+        self._conn.executemany("DELETE FROM results WHERE key = ?", evicted)
+
+    def clear(self) -> None:
+        """Remove all results from the cache"""
+        with self._lock, self._conn:
+            self._uses.clear()
+            self._conn.execute("DELETE FROM results")
+
+    def close(self) -> None:
+        """Write the recorded cache hits and close the cache database"""
+        with self._lock:
+            with self._conn:
+                self._flush_uses()
+            self._conn.close()
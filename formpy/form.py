@@ -1,32 +1,108 @@
 from __future__ import annotations
 
-from typing import Tuple
+import warnings
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Iterator, Tuple
 
 import cv2
 import numpy as np
 
 import formpy.utils.img_processing as ip
+from formpy.cache import ResultCache
+from formpy.utils.buffers import BufferPool
+from formpy.utils.documents import iter_pages, read_img
+from formpy.utils.scoring import (
+    fill_ratios,
+    question_confidence,
+    weighted_fill_ratios,
+)
 
+from .answer import Answer
 from .template import Template
 
 
 class Form:
     """A class to represent a form."""
 
-    def __init__(self, img: np.ndarray, template: Template) -> Form:
+    def __init__(
+        self,
+        img: np.ndarray,
+        template: Template,
+        source: str | None = None,
+        page: int | None = None,
+        pool: BufferPool | None = None,
+        workers: int = 1,
+        cache: ResultCache | None = None,
+        hint: np.ndarray | None = None,
+        scale: float = 1.0,
+        executor: Executor | None = None,
+    ) -> Form:
         """Initialise form with an associated template that it was built from
 
         Args:
             img (np.ndarray): a form image read into array
             e.g. via cv2.imread()
             template (Template): template that the form was built from
+            source (str | None, optional): path of the file the form image was
+            read from. Defaults to None.
+            page (int | None, optional): index of the page in source if it is
+            a multi-page document. Defaults to None.
+            pool (BufferPool | None, optional): pool to reuse the intermediate
+            images from when processing many forms in a worker. Only the
+            intermediate images are kept in the pool, Form.img is a new array
+            so forms using the same pool can be scored in any order.
+            Defaults to None.
+            workers (int, optional): number of threads to score the answers
+            and register the questions of the form in parallel with, so a
+            single form can use all cores. Defaults to 1.
+            cache (ResultCache | None, optional): cache of fill ratios to
+            look up before the image is processed. If the same page was
+            already scored with the template the stored fill ratios are used
+            and Form.img is only processed when it is first used, otherwise
+            the fill ratios are stored once they are calculated.
+            Defaults to None.
+            hint (np.ndarray | None, optional): corners of the outer box on a
+            previous page e.g. Form.corners, to track the box from instead of
+            detecting it on the whole page. Defaults to None.
+            scale (float, optional): scale of Form.img relative to the
+            template e.g. 0.5 for a page decoded at half resolution. The form
+            is scored at this scale with Template.answer_kernels() instead of
+            being resized up to the full template size. Defaults to 1.0.
+            executor (Executor | None, optional): thread pool used when
+            workers > 1, which can be shared by many forms e.g. in a web
+            service. Defaults to None, and a pool is created once for the form
+            when it is first needed, which is shut down by Form.close().
 
         Returns:
             Form
         """
         self.template = template
-        self.img = self.__resize_img(img)
+        self.scale = scale
+        self.workers = workers
+        self.executor = executor
+        # only a pool created by the form is shut down when it is closed
+        self._owns_executor = False
+        self.source = source
+        self.page = page
         self.questions = template.questions
+        self.answer_offsets = None
+        self._fill_ratios = None
+        # corners of the alignment feature found when the image is processed
+        self.corners = None
+        self._hint = hint
+        self.cache = cache
+        self.cache_key = None
+        if cache is not None:
+            self.cache_key = cache.key(img, template, scale)
+            self._fill_ratios = cache.get(self.cache_key)
+
+        self._raw_img = None
+        if self._fill_ratios is None:
+            self._img = self.__resize_img(img, pool)
+        else:
+            # only processed if Form.img is used
+            self._img = None
+            self._raw_img = img
 
     def __repr__(self) -> str:
         return (
@@ -34,20 +110,391 @@ class Form:
             f"{sum([len(i.answers) for i in self.questions])}"
         )
 
-    def __resize_img(self, img: np.ndarray) -> np.ndarray:
-        """resize image to be of same size as template
+    def __enter__(self) -> Form:
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    @classmethod
+    def from_path(
+        cls,
+        img_path: str,
+        template: Template,
+        reduce_factor: int | None = None,
+        cache: ResultCache | None = None,
+        scale: float = 1.0,
+        workers: int = 1,
+        executor: Executor | None = None,
+    ) -> Form:
+        """Initialise form from an image file decoded straight to grayscale
+
+        Args:
+            img_path (str): path to image of form
+            template (Template): template that the form was built from
+            reduce_factor (int | None, optional): factor to reduce the
+            resolution of the image by when decoding, see
+            documents.read_img(). Defaults to None, and
+            Template.decode_factor() is used.
+            cache (ResultCache | None, optional): see Form.__init__.
+            Defaults to None.
+            scale (float, optional): scale to score the form at, see
+            Form.__init__. Defaults to 1.0.
+            workers (int, optional): number of threads to score the form
+            with, see Form.__init__. Defaults to 1.
+            executor (Executor | None, optional): see Form.__init__.
+            Defaults to None.
+
+        Returns:
+            Form
+        """
+        if reduce_factor is None:
+            reduce_factor = template.decode_factor()
+        img = read_img(img_path, reduce_factor)
+        return cls(
+            img,
+            template,
+            source=str(img_path),
+            workers=workers,
+            cache=cache,
+            scale=scale,
+            executor=executor,
+        )
+
+    @classmethod
+    def iter_document(
+        cls,
+        path: str,
+        template: Template,
+        dpi: int = 200,
+        reduce_factor: int | None = None,
+        cache: ResultCache | None = None,
+        scale: float = 1.0,
+        workers: int = 1,
+        executor: Executor | None = None,
+    ) -> Iterator[Form]:
+        """Lazily create a form from each page of a multi-page TIFF or PDF
+        document (PDF requires PyMuPDF). Each page is decoded when the form is
+        created and released once only the processed form image is kept. The
+        outer box found on each page is tracked on the next page instead of
+        being detected on the whole page again.
+
+        Args:
+            path (str): path to the document
+            template (Template): template that the forms were built from
+            dpi (int, optional): resolution to render PDF pages at.
+            Defaults to 200.
+            reduce_factor (int | None, optional): factor to reduce the
+            resolution of each page by when decoding, see
+            documents.iter_pages(). Defaults to None, and
+            Template.decode_factor() is used.
+            cache (ResultCache | None, optional): see Form.__init__.
+            Defaults to None.
+            scale (float, optional): scale to score the forms at, see
+            Form.__init__. Defaults to 1.0.
+            workers (int, optional): number of threads to score each form
+            with, see Form.__init__. Defaults to 1.
+            executor (Executor | None, optional): thread pool shared by the
+            forms of all pages when workers > 1. Defaults to None, and each
+            form creates its own pool which is shut down by Form.close().
+
+        Yields:
+            Iterator[Form]: form for each page with Form.source and Form.page
+            set
+        """
+        if reduce_factor is None:
+            reduce_factor = template.decode_factor()
+        hint = None
+        for page_idx, img in iter_pages(path, dpi=dpi, reduce_factor=reduce_factor):
+            form = cls(
+                img,
+                template,
+                source=str(path),
+                page=page_idx,
+                workers=workers,
+                cache=cache,
+                hint=hint,
+                scale=scale,
+                executor=executor,
+            )
+            # pages found in the cache are not processed so keep the last hint
+            if form.corners is not None:
+                hint = form.corners
+            yield form
+
+    @property
+    def img(self) -> np.ndarray:
+        """Thresholded form image aligned and resized to the template
+
+        Returns:
+            np.ndarray: processed form image
+        """
+        if self._img is None:
+            self._img = self.__resize_img(self._raw_img)
+            self._raw_img = None
+        return self._img
+
+    @img.setter
+    def img(self, img: np.ndarray) -> None:
+        self._img = img
+
+    @property
+    def form_id(self) -> str | None:
+        """id of the form from its source file and page index
+
+        Returns:
+            str | None: "<source>" or "<source>:<page>" for multi-page
+            documents, None if the source is not known
+        """
+        if self.source is None:
+            return None
+        if self.page is None:
+            return self.source
+        return f"{self.source}:{self.page}"
+
+    def __resize_img(
+        self, img: np.ndarray, pool: BufferPool | None = None
+    ) -> np.ndarray:
+        """resize image to be of same size as template, at Form.scale
 
         Args:
             img (np.ndarray): form image read into array e.g. via cv2.imread()
+            pool (BufferPool | None, optional): pool to reuse the intermediate
+            images from. Defaults to None.
         """
-        processed_img = ip.process_img(img)
+        processed_img, self.corners = ip.process_img(
+            img,
+            alignment=self.template.alignment,
+            detect_rotation=self.template.detect_rotation,
+            pool=pool,
+            hint=self._hint,
+            return_corners=True,
+        )
+        height, width = self.template.img.shape[:2]
+        if self.scale != 1.0:
+            height, width = round(height * self.scale), round(width * self.scale)
         resized_img = cv2.resize(
             processed_img,
-            (self.template.img.shape[1], self.template.img.shape[0]),
+            (width, height),
             interpolation=cv2.INTER_LINEAR,
         )
         return resized_img
 
+    def __thread_pool(self) -> Executor | None:
+        """thread pool to score and register the form with, created once"""
+        if self.executor is None and self.workers > 1:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers)
+            self._owns_executor = True
+        return self.executor
+
+    def close(self) -> None:
+        """Shut down the thread pool created by the form, an executor passed
+        to Form.__init__ is left running for the other forms sharing it"""
+        if self._owns_executor:
+            self.executor.shutdown()
+            self.executor = None
+            self._owns_executor = False
+
+    def __template_size_img(self) -> np.ndarray:
+        """Form.img resized up to the size of the template if the form is
+        scored at a reduced scale, for the features that use template
+        coordinates
+        """
+        if self.scale == 1.0:
+            return self.img
+        height, width = self.template.img.shape[:2]
+        return cv2.resize(self.img, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    @property
+    def fill_ratios(self) -> np.ndarray:
+        """Filled percentage of every answer on the form, in the same order
+        as Template.answers. Calculated once in a single pass and stored so
+        the form can be re-scored with different thresholds without
+        processing the image again.
+
+        Returns:
+            np.ndarray: array with range from 0.0 - 1.0 for each answer
+        """
+        if self._fill_ratios is None:
+            offsets = 0 if self.answer_offsets is None else self.answer_offsets
+            if self.template.subpixel or self.scale != 1.0:
+                # hard edged circles can not be scaled so use weighted kernels
+                origins, kernels = self.template.answer_kernels(self.scale)
+                if self.scale != 1.0:
+                    offsets = np.rint(np.multiply(offsets, self.scale)).astype(int)
+                self._fill_ratios = weighted_fill_ratios(
+                    self.img,
+                    origins + offsets,
+                    kernels,
+                    self.workers,
+                    self.__thread_pool(),
+                )
+            else:
+                self._fill_ratios = fill_ratios(
+                    self.img,
+                    self.template.answer_coords + offsets,
+                    self.template.circle_radius,
+                    self.workers,
+                    self.__thread_pool(),
+                )
+            if self.cache is not None and self.answer_offsets is None:
+                self.cache.put(self.cache_key, self._fill_ratios)
+        return self._fill_ratios
+
+    def register_local(
+        self,
+        reference: np.ndarray | None = None,
+        search: int = 10,
+        min_score: float = 0.5,
+        workers: int | None = None,
+    ) -> np.ndarray:
+        """Correct local misalignment of each question e.g. on curled pages by
+        template matching the question region against a reference image in a
+        small search window. The offsets are applied to the answers of each
+        question when the form is scored.
+
+        A reference image of the printed form is effectively required, e.g.
+        Form.img of a blank form set as Template.reference_img. Template.img
+        only has the answer circles, which rarely match the printed form well
+        enough and leave the questions unregistered.
+
+        Args:
+            reference (np.ndarray | None, optional): aligned reference image
+            with the same size as the template. Defaults to None, and
+            Template.reference_img is used, or Template.img with a warning if
+            not set.
+            search (int, optional): maximum offset in pixels. Defaults to 10.
+            min_score (float, optional): minimum normalised correlation for
+            the offset to be used. Defaults to 0.5.
+            workers (int | None, optional): number of threads to match
+            questions in parallel with. Defaults to None, and Form.workers is
+            used.
+
+        Returns:
+            np.ndarray: (n_questions, 2) array of x, y offsets of each question
+        """
+        if reference is None:
+            reference = self.template.reference_img
+        if reference is None:
+            warnings.warn(
+                "Template.reference_img is not set, registering against "
+                "Template.img which rarely matches the printed form",
+                stacklevel=2,
+            )
+            reference = self.template.img
+        if workers is None:
+            workers = self.workers
+
+        question_offsets = ip.local_offsets(
+            self.__template_size_img(),
+            reference,
+            self.template.question_bboxes,
+            search,
+            min_score,
+            workers,
+            self.__thread_pool() if workers == self.workers else None,
+        )
+        self.answer_offsets = question_offsets[self.template.answer_question_idx]
+        self._fill_ratios = None
+        return question_offsets
+
+    def filled(self, thresholds: float | np.ndarray | None = None) -> np.ndarray:
+        """Check which answers on the form are filled in
+
+        Args:
+            thresholds (float | np.ndarray | None, optional): threshold for all
+            answers or array of thresholds for each answer in the same order as
+            Template.answers. Defaults to None, and Answer.filled_threshold is
+            used for each answer.
+
+        Returns:
+            np.ndarray: boolean array, true for each filled answer
+        """
+        if thresholds is None:
+            thresholds = self.template.answer_thresholds
+        return self.fill_ratios >= thresholds
+
+    def confidence(
+        self,
+        thresholds: float | np.ndarray | None = None,
+        min_margin: float = 0.1,
+        blank_level: float = 0.2,
+    ) -> dict[str, np.ndarray]:
+        """Confidence of the answers found for each question, calculated from
+        the stored fill ratios
+
+        Args:
+            thresholds (float | np.ndarray | None, optional): see
+            Form.filled(). Defaults to None.
+            min_margin (float, optional): fill ratios closer than this to the
+            threshold are ambiguous. Defaults to 0.1.
+            blank_level (float, optional): fill ratios between this and the
+            threshold are partially filled. Defaults to 0.2.
+
+        Returns:
+            dict[str, np.ndarray]: "margin", "partial", "ambiguous" and "blank"
+            arrays with a value for each question, see
+            scoring.question_confidence()
+        """
+        if thresholds is None:
+            thresholds = self.template.answer_thresholds
+        return question_confidence(
+            self.fill_ratios,
+            self.template.answer_question_ids,
+            thresholds,
+            [qn.multiple for qn in self.questions],
+            min_margin,
+            blank_level,
+        )
+
+    def needs_review(
+        self,
+        thresholds: float | np.ndarray | None = None,
+        min_margin: float = 0.1,
+        blank_level: float = 0.2,
+    ) -> bool:
+        """Check if any question on the form is ambiguous and should be
+        reviewed, see Form.confidence()
+
+        Returns:
+            bool: true if any question is ambiguous
+        """
+        confidence = self.confidence(thresholds, min_margin, blank_level)
+        return bool(confidence["ambiguous"].any())
+
+    def find_answers(
+        self, thresholds: float | np.ndarray | None = None
+    ) -> dict[int, list[Answer]]:
+        """Find marked answer(s) for every question on the form
+
+        Args:
+            thresholds (float | np.ndarray | None, optional): see
+            Form.filled(). Defaults to None.
+
+        Returns:
+            dict[int, list[Answer]]: map of question id to marked answers. Only
+            the first marked answer is returned if question.multiple == False
+        """
+        filled = self.filled(thresholds)
+        answers = {}
+        start = 0
+        for qn in self.questions:
+            end = start + len(qn.answers)
+            marked = [qn.answers[i] for i in np.flatnonzero(filled[start:end])]
+            answers[qn.question_id] = marked if qn.multiple else marked[:1]
+            start = end
+        return answers
+
+    def question_imgs(self) -> list[np.ndarray]:
+        """Crop the region of each question from the form image
+
+        Returns:
+            list[np.ndarray]: cropped image of each question in the same order
+            as Form.questions, these are views of Form.img so are not copied
+            unless the form is scored at a reduced scale
+        """
+        return self.template.crop_questions(self.__template_size_img())
+
     def mark_all_answers(self, colour: Tuple[int] = (0, 0, 255)) -> np.ndarray:
         """mark all answers on the form image with the question id and answer value
 
@@ -59,21 +506,65 @@ class Form:
             np.ndarray: form image with marked answers, answer values and
             question ids
         """
-        colour_img = cv2.cvtColor(cv2.bitwise_not(self.img), cv2.COLOR_GRAY2BGR)
+        return self.__review_img(colour, answers=True)
 
-        for qn in self.template.questions:
-            answers = qn.answers
-            for ans in answers:
+    def render_review(
+        self,
+        colour: Tuple[int] = (0, 0, 255),
+        flagged: np.ndarray | None = None,
+        flag_colour: Tuple[int] = (0, 165, 255),
+        scale: float = 1.0,
+        path: str | None = None,
+        jpeg_quality: int = 80,
+    ) -> np.ndarray:
+        """Render an image of the form for review with the labels of all
+        answers and only the filled (and flagged) answers marked
 
-                cv2.putText(
-                    colour_img,
-                    str(qn.question_id) + ans.value,
-                    (ans.x, ans.y),
-                    cv2.FONT_HERSHEY_COMPLEX,
-                    0.4,
-                    colour,
-                )
+        Args:
+            colour (Tuple[int], optional): color of text and filled answers in
+            BGR. Defaults to (0, 0, 255).
+            flagged (np.ndarray | None, optional): boolean array in the same
+            order as Template.answers of answers to highlight for review.
+            Defaults to None.
+            flag_colour (Tuple[int], optional): color of flagged answers in
+            BGR. Defaults to (0, 165, 255).
+            scale (float, optional): scale factor to resize the rendered image
+            by. Defaults to 1.0.
+            path (str | None, optional): path to write the rendered image to
+            e.g. a .jpg file. Defaults to None.
+            jpeg_quality (int, optional): quality from 0 - 100 used if path is
+            a JPEG. Defaults to 80.
+
+        Returns:
+            np.ndarray: rendered review image
+        """
+        colour_img = self.__review_img(colour)
+        coords = self.template.answer_coords
+        radius = self.template.circle_radius
+        if flagged is not None:
+            ip.draw_circles(colour_img, coords[flagged], radius, flag_colour)
+        ip.draw_circles(colour_img, coords[self.filled()], radius, colour)
+
+        if scale != 1.0:
+            colour_img = cv2.resize(
+                colour_img, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA
+            )
+        if path is not None:
+            cv2.imwrite(path, colour_img, [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality])
 
-                ans.mark_answer(colour_img, colour=colour, circle_thickness=-1)
+        return colour_img
+
+    def __review_img(self, colour: Tuple[int], answers: bool = False) -> np.ndarray:
+        """form image in colour with the pre-rendered template labels drawn on
 
+        Args:
+            colour (Tuple[int]): color of labels in BGR
+            answers (bool, optional): also draw all answer circles.
+            Defaults to False.
+        """
+        colour_img = cv2.cvtColor(
+            cv2.bitwise_not(self.__template_size_img()), cv2.COLOR_GRAY2BGR
+        )
+        label_layer, label_mask = self.template.label_layer(colour, answers)
+        cv2.copyTo(label_layer, label_mask, colour_img)
         return colour_img
@@ -22,38 +22,43 @@ class Question:
         self.answers = answers
         self.multiple = multiple
         self.question_id = question_id
+        self._bbox = None
 
     @property
+    def bbox(self) -> np.ndarray:
+        """Bounding box of all answer circles of the question, this is set by
+        Template.compile_answers() or calculated once when first used so set
+        it again if the answers are changed
+
+        Returns:
+            np.ndarray: x0, y0, x1, y1 coordinates of the bounding box, all
+            zeros if the question has no answers
+        """
+        if self._bbox is None:
+            self._bbox = np.zeros(4, dtype=int)
+            if self.answers:
+                coords = np.array([(ans.x, ans.y) for ans in self.answers], dtype=int)
+                radius = max(ans.circle_radius for ans in self.answers)
+                self._bbox[:2] = coords.min(axis=0) - radius
+                self._bbox[2:] = coords.max(axis=0) + radius + 1
+        return self._bbox
+
+    @bbox.setter
+    def bbox(self, bbox: np.ndarray | None) -> None:
+        self._bbox = bbox
+
     def question_img(self, form_img: np.ndarray) -> np.ndarray:
         """return cropped form image of the question
 
         Args:
-            form_img (np.ndarray): form image read into array
-            e.g. via cv2.imread()
+            form_img (np.ndarray): aligned form image e.g. Form.img
 
         Returns:
-            np.ndarray: cropped form image
+            np.ndarray: cropped form image, this is a view of form_img so is
+            not copied
         """
-        return form_img[
-            self.__search_area_y0 : self.__search_area_y1,
-            self.__search_area_x0 : self.__search_area_x1,
-        ]
-
-    @property
-    def __search_area_x0(self):
-        return min([ans.x for ans in self.answers])
-
-    @property
-    def __search_area_x1(self):
-        return max([ans.x for ans in self.answers])
-
-    @property
-    def __search_area_y0(self):
-        return min([ans.y for ans in self.answers])
-
-    @property
-    def __search_area_y1(self):
-        return max([ans.y for ans in self.answers])
+        x0, y0, x1, y1 = np.maximum(self.bbox, 0)
+        return form_img[y0:y1, x0:x1]
 
     def find_answers(self, img: np.ndarray) -> list[Answer]:
         """Find marked answer(s) for question
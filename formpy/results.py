@@ -0,0 +1,260 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+from formpy.utils.scoring import question_confidence
+
+if TYPE_CHECKING:
+    from formpy.form import Form
+    from formpy.template import Template
+
+
+class ResultStore:
+    """A class to store the raw fill ratios of many forms built from the same
+    template, so they can be re-scored with new thresholds without processing
+    the images again."""
+
+    def __init__(
+        self,
+        question_ids: np.ndarray,
+        answer_values: np.ndarray,
+        thresholds: np.ndarray,
+        multiple: dict[int, bool],
+    ):
+        """Initialise an empty result store with one column per answer.
+
+        Args:
+            question_ids (np.ndarray): question id of each answer column,
+            answers of the same question must be next to each other
+            answer_values (np.ndarray): value of each answer column
+            thresholds (np.ndarray): default filled threshold of each answer
+            column
+            multiple (dict[int, bool]): map of question id to true/false flag
+            for multiple answers
+        """
+        self.question_ids = np.asarray(question_ids, dtype=int)
+        self.answer_values = np.asarray(answer_values, dtype=str)
+        self.thresholds = np.asarray(thresholds, dtype=float)
+        self.multiple = multiple
+        self.form_ids = []
+        self._rows = []
+        # same precision as Form.fill_ratios so answers are filled the same
+        self._ratios = np.empty((0, len(self.question_ids)), dtype="float64")
+
+    def __len__(self) -> int:
+        return len(self.form_ids)
+
+    def __repr__(self) -> str:
+        return (
+            f"ResultStore with {len(self)} forms and "
+            f"{len(self.question_ids)} answers"
+        )
+
+    @classmethod
+    def from_template(cls, template: Template) -> ResultStore:
+        """Create an empty result store for forms built from template
+
+        Args:
+            template (Template): template the forms are built from
+
+        Returns:
+            ResultStore
+        """
+        return cls(
+            question_ids=template.answer_question_ids,
+            answer_values=[ans.value for ans in template.answers],
+            thresholds=template.answer_thresholds,
+            multiple={qn.question_id: qn.multiple for qn in template.questions},
+        )
+
+    def add(self, fill_ratios: np.ndarray, form_id: str) -> None:
+        """Add the fill ratios of a single form
+
+        Args:
+            fill_ratios (np.ndarray): fill ratio of each answer e.g. from
+            Form.fill_ratios
+            form_id (str): id to identify the form e.g. path of the scan
+
+        Raises:
+            ValueError: if the number of fill ratios does not match the number
+            of answers
+        """
+        if len(fill_ratios) != len(self.question_ids):
+            raise ValueError(
+                f"Expected {len(self.question_ids)} fill ratios, "
+                f"got {len(fill_ratios)}"
+            )
+        self._rows.append(np.asarray(fill_ratios, dtype="float64"))
+        self.form_ids.append(str(form_id))
+
+    def append(self, form: Form, form_id: str | None = None) -> None:
+        """Add the fill ratios of a form
+
+        Args:
+            form (Form): scored form
+            form_id (str | None, optional): id to identify the form e.g. path
+            of the scan. Defaults to None, and Form.form_id is used.
+
+        Raises:
+            ValueError: if form_id is not provided and the form has no source
+        """
+        if form_id is None:
+            form_id = form.form_id
+        if form_id is None:
+            raise ValueError("form_id is required for forms without a source")
+        self.add(form.fill_ratios, form_id)
+
+    @property
+    def ratios(self) -> np.ndarray:
+        """Fill ratios of all forms
+
+        Returns:
+            np.ndarray: (n_forms, n_answers) array of fill ratios
+        """
+        if self._rows:
+            self._ratios = np.vstack([self._ratios, *self._rows])
+            self._rows = []
+        return self._ratios
+
+    def answer_thresholds(
+        self, thresholds: float | np.ndarray | dict[int, float] | None = None
+    ) -> np.ndarray:
+        """Threshold for each answer column
+
+        Args:
+            thresholds (float | np.ndarray | dict[int, float] | None, optional):
+            threshold for all answers, array of thresholds for each answer or
+            map of question id to threshold for each question. Questions
+            missing from the map use the default thresholds. Defaults to None,
+            and the default thresholds are used.
+
+        Returns:
+            np.ndarray: threshold for each answer column
+        """
+        if thresholds is None:
+            return self.thresholds
+        if isinstance(thresholds, dict):
+            answer_thresholds = self.thresholds.copy()
+            for question_id, threshold in thresholds.items():
+                answer_thresholds[self.question_ids == question_id] = threshold
+            return answer_thresholds
+        return np.broadcast_to(
+            np.asarray(thresholds, dtype=float), self.thresholds.shape
+        )
+
+    def filled(
+        self, thresholds: float | np.ndarray | dict[int, float] | None = None
+    ) -> np.ndarray:
+        """Check which answers are filled on every form
+
+        Args:
+            thresholds (float | np.ndarray | dict[int, float] | None, optional):
+            see ResultStore.answer_thresholds(). Defaults to None.
+
+        Returns:
+            np.ndarray: (n_forms, n_answers) boolean array, true for each
+            filled answer
+        """
+        return self.ratios >= self.answer_thresholds(thresholds)
+
+    def confidence(
+        self,
+        thresholds: float | np.ndarray | dict[int, float] | None = None,
+        min_margin: float = 0.1,
+        blank_level: float = 0.2,
+    ) -> dict[str, np.ndarray]:
+        """Confidence of the answers found for each question on every form
+
+        Args:
+            thresholds (float | np.ndarray | dict[int, float] | None, optional):
+            see ResultStore.answer_thresholds(). Defaults to None.
+            min_margin (float, optional): fill ratios closer than this to the
+            threshold are ambiguous. Defaults to 0.1.
+            blank_level (float, optional): fill ratios between this and the
+            threshold are partially filled. Defaults to 0.2.
+
+        Returns:
+            dict[str, np.ndarray]: "margin", "partial", "ambiguous" and "blank"
+            (n_forms, n_questions) arrays, see scoring.question_confidence()
+        """
+        return question_confidence(
+            self.ratios,
+            self.question_ids,
+            self.answer_thresholds(thresholds),
+            list(self.multiple.values()),
+            min_margin,
+            blank_level,
+        )
+
+    def answers(
+        self, thresholds: float | np.ndarray | dict[int, float] | None = None
+    ) -> list[dict[int, list[str]]]:
+        """Find the marked answer values of every form
+
+        Args:
+            thresholds (float | np.ndarray | dict[int, float] | None, optional):
+            see ResultStore.answer_thresholds(). Defaults to None.
+
+        Returns:
+            list[dict[int, list[str]]]: map of question id to marked answer
+            values for each form. Only the first marked answer is returned if
+            the question does not allow multiple answers.
+        """
+        filled = self.filled(thresholds)
+        for question_id, multiple in self.multiple.items():
+            if not multiple:
+                # keep the first filled answer of the question on each form
+                columns = self.question_ids == question_id
+                first = np.cumsum(filled[:, columns], axis=1) == 1
+                filled[:, columns] &= first
+
+        results = []
+        for row in filled:
+            answers = {question_id: [] for question_id in self.multiple}
+            for idx in np.flatnonzero(row):
+                answers[int(self.question_ids[idx])].append(self.answer_values[idx])
+            results.append(answers)
+        return results
+
+    def save(self, path: str) -> None:
+        """Save the result store to a compressed .npz file
+
+        Args:
+            path (str): path of the file to save to
+        """
+        multiple_ids = np.array(list(self.multiple.keys()), dtype=int)
+        np.savez_compressed(
+            path,
+            ratios=self.ratios,
+            form_ids=np.array(self.form_ids, dtype=str),
+            question_ids=self.question_ids,
+            answer_values=self.answer_values,
+            thresholds=self.thresholds,
+            multiple_ids=multiple_ids,
+            multiple=np.array(list(self.multiple.values()), dtype=bool),
+        )
+
+    @classmethod
+    def load(cls, path: str) -> ResultStore:
+        """Load a result store saved with ResultStore.save()
+
+        Args:
+            path (str): path of the .npz file
+
+        Returns:
+            ResultStore
+        """
+        with np.load(path) as data:
+            store = cls(
+                question_ids=data["question_ids"],
+                answer_values=data["answer_values"],
+                thresholds=data["thresholds"],
+                multiple=dict(
+                    zip(data["multiple_ids"].tolist(), data["multiple"].tolist())
+                ),
+            )
+            store._ratios = data["ratios"].astype("float64")
+            store.form_ids = data["form_ids"].tolist()
+        return store
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import hashlib
 import json
-from typing import TYPE_CHECKING
+from typing import Tuple
 
 import cv2
 import numpy as np
@@ -9,26 +10,216 @@ import numpy as np
 import formpy.utils.img_processing as ip
 from formpy.answer import Answer
 from formpy.question import Question
-from formpy.utils.template_definition import find_spots
-
-if TYPE_CHECKING:
-    from formpy.form import Form
+from formpy.utils.documents import REDUCED_GRAYSCALE_FLAGS, read_img
+from formpy.utils.schema import pack_template, unpack_template
+from formpy.utils.scoring import circle_kernels
+from formpy.utils.template_definition import find_spots, refine_centres
 
 
 class Template:
     """A class to represent a template that a form is built from."""
 
-    def __init__(self, img: np.ndarray, questions: list[Question], circle_radius: int):
+    def __init__(
+        self,
+        img: np.ndarray,
+        questions: list[Question],
+        circle_radius: int,
+        alignment: str = "outer_box",
+        detect_rotation: bool = False,
+    ):
         """initialise template
 
         Args:
             img (np.ndarray): image of template read in using e.g. cv2.imread()
             questions (list[Question]): list of questions on template
             circle_radius (int): size of answer circles
+            alignment (str, optional): feature used to align the template and
+            forms built from it, either "outer_box" or "fiducial" (ArUco
+            markers in each corner). Defaults to "outer_box".
+            detect_rotation (bool, optional): rotate sideways or upside down
+            forms upright using a solid marker inside the top-left corner of
+            the outer box. Defaults to False.
         """
         self.questions = questions
-        self.img = ip.process_img(img)
+        self.scan_shape = img.shape[:2]
+        self.alignment = alignment
+        self.detect_rotation = detect_rotation
+        self.img = ip.process_img(
+            img, alignment=alignment, detect_rotation=detect_rotation
+        )
         self.circle_radius = circle_radius
+        # aligned image of a printed form (e.g. Form.img of a blank form) to
+        # correct local misalignment with, see Form.register_local()
+        self.reference_img = None
+        self.compile_answers()
+
+    def decode_factor(
+        self, scan_shape: Tuple[int, int] | None = None, min_radius: int = 8
+    ) -> int:
+        """Largest factor that forms can be decoded at a reduced resolution by
+        while answer circles still have at least min_radius pixels, see
+        documents.read_img()
+
+        Args:
+            scan_shape (Tuple[int, int] | None, optional): height and width of
+            the scanned forms. Defaults to None, and forms are assumed to be
+            scanned at the same resolution as the template.
+            min_radius (int, optional): minimum radius in pixels of the answer
+            circles after reducing the resolution. Defaults to 8.
+
+        Returns:
+            int: reduce factor of 1, 2, 4 or 8
+        """
+        scale = 1.0
+        if scan_shape is not None:
+            scale = scan_shape[1] / self.scan_shape[1]
+        scan_radius = self.circle_radius * scale
+
+        factor = 1
+        for reduce_factor in REDUCED_GRAYSCALE_FLAGS:
+            if scan_radius / reduce_factor >= min_radius:
+                factor = reduce_factor
+        return factor
+
+    def compile_answers(self) -> None:
+        """Pack the answers of all questions into arrays so every answer on a
+        form can be scored in one pass. Answers of each question are kept
+        next to each other in question order. Call again if questions or
+        answers are changed after the template is created.
+        """
+        self.answers = [ans for qn in self.questions for ans in qn.answers]
+        self.answer_coords = np.array(
+            [(ans.x, ans.y) for ans in self.answers], dtype=int
+        ).reshape(-1, 2)
+        self.answer_thresholds = np.array(
+            [ans.filled_threshold for ans in self.answers], dtype=float
+        )
+        self.answer_question_ids = np.array(
+            [qn.question_id for qn in self.questions for _ in qn.answers], dtype=int
+        )
+        n_answers = [len(qn.answers) for qn in self.questions]
+        self.answer_question_idx = np.repeat(np.arange(len(self.questions)), n_answers)
+
+        # bounding box of the answer circles of each question, answers of a
+        # question are next to each other so reduce from the start of each one
+        # that has answers, the box of a question without answers is all zeros
+        self.question_bboxes = np.zeros((len(self.questions), 4), dtype=int)
+        has_answers = np.array(n_answers, dtype=int) > 0
+        if has_answers.any():
+            starts = np.cumsum([0, *n_answers[:-1]], dtype=int)[has_answers]
+            radii = np.array([ans.circle_radius for ans in self.answers], dtype=int)
+            radii = np.maximum.reduceat(radii, starts)[:, None]
+            self.question_bboxes[has_answers] = np.hstack(
+                [
+                    np.minimum.reduceat(self.answer_coords, starts) - radii,
+                    np.maximum.reduceat(self.answer_coords, starts) + radii + 1,
+                ]
+            )
+        for qn, bbox in zip(self.questions, self.question_bboxes):
+            qn.bbox = bbox
+
+        self.answer_centres = self.answer_coords.astype("float64")
+        self.subpixel = False
+        self._answer_kernels = {}
+        self._fingerprint = None
+        self._label_layers = {}
+
+    def refine_answer_centres(self) -> None:
+        """Refine the centre of every answer to sub-pixel accuracy from the
+        template image, which must have all answers filled in. Forms are then
+        scored with anti-aliased kernels instead of hard edged circles, see
+        Template.answer_kernels().
+        """
+        self.answer_centres = refine_centres(
+            self.img, self.answer_coords, self.circle_radius
+        )
+        self.subpixel = True
+        self._answer_kernels = {}
+        self._fingerprint = None
+
+    @property
+    def fingerprint(self) -> str:
+        """Hash of the answers, config and image size of the template, which
+        the fill ratios of forms built from it depend on. Calculated once and
+        reset when the answers are compiled again.
+
+        Returns:
+            str: hex digest of the template
+        """
+        if self._fingerprint is None:
+            digest = hashlib.blake2b(self.to_json().encode(), digest_size=16)
+            digest.update(str(self.img.shape).encode())
+            self._fingerprint = digest.hexdigest()
+        return self._fingerprint
+
+    def answer_kernels(self, scale: float = 1.0) -> Tuple[np.ndarray, np.ndarray]:
+        """Anti-aliased weight kernels of every answer, calculated once for
+        each scale
+
+        Args:
+            scale (float, optional): scale of the form image relative to the
+            template e.g. 0.5 to score a form at half resolution.
+            Defaults to 1.0.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: origins and kernels of each answer,
+            see scoring.circle_kernels()
+        """
+        if scale not in self._answer_kernels:
+            self._answer_kernels[scale] = circle_kernels(
+                self.answer_centres, self.circle_radius, scale
+            )
+        return self._answer_kernels[scale]
+
+    def label_layer(
+        self, colour: Tuple[int] = (0, 0, 255), answers: bool = False
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Image of the question id and answer value labels of all answers,
+        rendered once per colour and reused for every form
+
+        Args:
+            colour (Tuple[int], optional): colour of text in BGR.
+            Defaults to (0, 0, 255).
+            answers (bool, optional): also draw all answer circles.
+            Defaults to False.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: colour image of the labels and mask
+            of the labelled pixels, to use with cv2.copyTo()
+        """
+        key = (tuple(colour), answers)
+        if key not in self._label_layers:
+            mask = np.zeros(self.img.shape[:2], dtype="uint8")
+            for qn in self.questions:
+                for ans in qn.answers:
+                    cv2.putText(
+                        mask,
+                        str(qn.question_id) + ans.value,
+                        (ans.x, ans.y),
+                        cv2.FONT_HERSHEY_COMPLEX,
+                        0.4,
+                        255,
+                    )
+            if answers:
+                ip.draw_circles(mask, self.answer_coords, self.circle_radius, 255)
+            layer = np.zeros((*self.img.shape[:2], 3), dtype="uint8")
+            layer[mask > 0] = colour
+            self._label_layers[key] = (layer, mask)
+        return self._label_layers[key]
+
+    def crop_questions(self, img: np.ndarray) -> list[np.ndarray]:
+        """Crop the region of each question from an aligned image
+
+        Args:
+            img (np.ndarray): aligned image with the same size as the template
+            e.g. Form.img
+
+        Returns:
+            list[np.ndarray]: cropped image of each question in the same order
+            as Template.questions, these are views of img so are not copied
+        """
+        bboxes = np.maximum(self.question_bboxes, 0)
+        return [img[y0:y1, x0:x1] for x0, y0, x1, y1 in bboxes]
 
     @classmethod
     def from_img_template(
@@ -37,6 +228,9 @@ class Template:
         circle_radius: int,
         question_assignment: dict,
         question_config: dict = None,
+        alignment: str = "outer_box",
+        detect_rotation: bool = False,
+        subpixel: bool = False,
     ) -> Template:
         """Initialise template from img
 
@@ -47,14 +241,22 @@ class Template:
             id.
             question_config (dict, optional): map of question id to true/false
             flag for multiple answers. Defaults to None.
+            alignment (str, optional): "outer_box" or "fiducial", see
+            Template.__init__. Defaults to "outer_box".
+            detect_rotation (bool, optional): see Template.__init__.
+            Defaults to False.
+            subpixel (bool, optional): refine the answer centres to sub-pixel
+            accuracy, see Template.refine_answer_centres(). Defaults to False.
 
         Returns:
             Template
         """
 
         # load image and align
-        raw_img = cv2.imread(img_path)
-        img = ip.process_img(raw_img)
+        raw_img = read_img(img_path)
+        img = ip.process_img(
+            raw_img, alignment=alignment, detect_rotation=detect_rotation
+        )
 
         # find all spots - sorted by x then y
         all_spots = find_spots(
@@ -125,23 +327,30 @@ class Template:
 
             questions.append(question)
 
-        template = Template(raw_img, questions, circle_radius)
+        template = Template(
+            raw_img, questions, circle_radius, alignment, detect_rotation
+        )
+        if subpixel:
+            template.refine_answer_centres()
 
         return template
 
     @classmethod
-    def from_json(cls, json_path: str, img_path: str) -> Form:
-        """Return Form instance from pre-configured JSON.
+    def from_json(cls, json_path: str, img_path: str) -> Template:
+        """Return Template instance from pre-configured JSON.
 
         Args:
-            img_path (str): Path to image of template.
             json_path (str): Path to JSON containing configuration for form
-            template, see format below.
+            template, see Template.to_dict() for the format. The original
+            format below is also supported.
+            img_path (str): Path to image of template.
 
         .. code-block:: json
 
             {"config":
-                    {"radius":"<CIRCLE_RADIUS>"},
+                    {"radius":"<CIRCLE_RADIUS>",
+                    "alignment":"<outer_box|fiducial>",
+                    "detect_rotation":<BOOL>},
                 "questions":
                     {"question_id":
                         {
@@ -157,7 +366,7 @@ class Template:
 
 
         Returns:
-            Form: Return form instantiated from JSON config and image.
+            Template: Return template instantiated from JSON config and image.
         """
 
         with open(json_path, "r") as fp:
@@ -170,120 +379,75 @@ class Template:
         """Create template from dictionary of template config.
 
         Args:
-            template (dict): template config as shown below.
-
-        .. code-block:: python
-
-            {"config":
-                    {"radius":"<CIRCLE_RADIUS>"},
-                "questions":
-                    {"question_id":
-                        {
-                            "multiple":<BOOL>,
-                            "answers":
-                            [
-                                {"answer_val":"<ANSWER_VAL>",
-                                "answer_coords": ["<X_COORD>", "<Y_COORD>"]}
-                            ]
-                        }
-                    }
-                }
-
-        img_path (str): path to image of form
+            template (dict): template config from Template.to_dict() or in the
+            original format, see Template.from_json().
+            img_path (str): path to image of form
 
         Returns:
             Template
         """
-        img = cv2.imread(img_path)
+        img = read_img(img_path)
+        config = unpack_template(template)
+        circle_radius = config["radius"]
+        ends = np.cumsum(config["n_answers"])
 
         question_objs = []
-        questions = template["questions"]
-        question_ids = questions.keys()
-        circle_radius = template["config"]["radius"]
-        for question_id in question_ids:
-            answers = []
-            multiple = questions[question_id]["multiple"]
-            for answer in questions[question_id]["answers"]:
-                x, y = answer["answer_coords"]
-                answer_val = answer["answer_val"]
-                answers.append(Answer(x, y, answer_val, circle_radius))
-
-            question = Question(
-                question_id=int(question_id),
-                answers=answers,
-                multiple=multiple,
+        start = 0
+        for question_id, multiple, end in zip(
+            config["question_ids"].tolist(), config["multiple"].tolist(), ends
+        ):
+            answers = [
+                Answer(x, y, value, circle_radius, threshold)
+                for (x, y), value, threshold in zip(
+                    config["coords"][start:end].tolist(),
+                    config["values"][start:end],
+                    config["thresholds"][start:end].tolist(),
+                )
+            ]
+            question_objs.append(
+                Question(question_id=question_id, answers=answers, multiple=multiple)
             )
-            question_objs.append(question)
-
-        return Template(img, question_objs, circle_radius)
+            start = end
+
+        template = Template(
+            img,
+            question_objs,
+            circle_radius,
+            config["alignment"],
+            config["detect_rotation"],
+        )
+        if config["centres"] is not None:
+            template.answer_centres = config["centres"]
+            template.subpixel = True
+            template._fingerprint = None
+        return template
 
     def to_dict(self) -> dict:
-        """Convert template obj to dictionary. See docs for dictionary structure.
-
-        Return:
-            dict : dictionary representation of template as below.
-
-        .. code-block:: python
-
-            {"config":
-                    {"radius":"<CIRCLE_RADIUS>"},
-                "questions":
-                    {"question_id":
-                        {
-                            "multiple":<BOOL>,
-                            "answers":
-                            [
-                                {"answer_val":"<ANSWER_VAL>",
-                                "answer_coords": ["<X_COORD>", "<Y_COORD>"]}
-                            ]
-                        }
-                    }
-                }
+        """Convert template obj to dictionary with the answers of all
+        questions packed into arrays, so large templates are small and fast
+        to load. See schema.pack_template() for the dictionary structure.
 
+        Returns:
+            dict: dictionary representation of template
         """
-
-        question_dict = {}
-
-        for question in self.questions:
-            question_dict[question.question_id] = []
-            question_dict[question.question_id]["multiple"] = question.multiple
-            question_dict[question.question_id]["answers"] = []
-
-            for answer in question.answers:
-                question_dict[question.question_id]["answers"].append(
-                    {
-                        "answer_val": answer.value,
-                        "answer_coords": (answer.x, answer.y),
-                    }
-                )
-        template_dict = {}
-        template_dict["config"]["radius"] = self.circle_radius
-        template_dict["questions"] = question_dict
-        return template_dict
+        return pack_template(
+            radius=self.circle_radius,
+            alignment=self.alignment,
+            detect_rotation=self.detect_rotation,
+            question_ids=[qn.question_id for qn in self.questions],
+            multiple=[qn.multiple for qn in self.questions],
+            n_answers=[len(qn.answers) for qn in self.questions],
+            values=[ans.value for ans in self.answers],
+            coords=self.answer_coords,
+            thresholds=self.answer_thresholds,
+            centres=self.answer_centres if self.subpixel else None,
+        )
 
     def to_json(self) -> str:
         """Convert template into json string representation.
 
         Returns:
-            str: json string in format below.
-
-        .. code-block:: json
-
-            {"config":
-                    {"radius":"<CIRCLE_RADIUS>"},
-                "questions":
-                    {"question_id":
-                        {
-                            "multiple":<BOOL>,
-                            "answers":
-                            [
-                                {"answer_val":"<ANSWER_VAL>",
-                                "answer_coords": ["<X_COORD>", "<Y_COORD>"]}
-                            ]
-                        }
-                    }
-                }
-
+            str: json string of Template.to_dict()
         """
         return json.dumps(self.to_dict())
 
@@ -0,0 +1,58 @@
+from __future__ import annotations
+
+from typing import Tuple
+
+import numpy as np
+
+
+class BufferPool:
+    """A class to reuse the intermediate images of each form so processing
+    pages of the same size does not allocate new page sized arrays.
+
+    One pool should be used per worker, since a buffer is overwritten every
+    time it is requested."""
+
+    def __init__(self):
+        """Initialise an empty pool, buffers are allocated on first use"""
+        self._buffers = {}
+
+    def __repr__(self) -> str:
+        return f"BufferPool with {len(self._buffers)} buffers ({self.nbytes} bytes)"
+
+    @property
+    def nbytes(self) -> int:
+        """Total size of all buffers in the pool"""
+        return sum(buf.nbytes for buf in self._buffers.values())
+
+    def get(
+        self, name: str, shape: Tuple[int, ...], dtype: str = "uint8"
+    ) -> np.ndarray:
+        """Return a buffer with the requested shape. The buffer for name is
+        reused if it is large enough, otherwise it is replaced with a larger
+        one so small differences in page size do not allocate new arrays.
+
+        Args:
+            name (str): name of the buffer e.g. "thresh"
+            shape (Tuple[int, ...]): shape of the buffer
+            dtype (str, optional): data type of the buffer. Defaults to "uint8".
+
+        Returns:
+            np.ndarray: view of the buffer with the requested shape, the
+            contents are undefined
+        """
+        shape = tuple(int(i) for i in shape)
+        dtype = np.dtype(dtype)
+        buf = self._buffers.get(name)
+
+        if buf is None or buf.dtype != dtype or buf.ndim != len(shape):
+            buf = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buf
+        elif any(size < requested for size, requested in zip(buf.shape, shape)):
+            buf = np.empty(np.maximum(buf.shape, shape), dtype=dtype)
+            self._buffers[name] = buf
+
+        return buf[tuple(slice(0, size) for size in shape)]
+
+    def clear(self) -> None:
+        """Release all buffers in the pool"""
+        self._buffers.clear()
@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from typing import Iterator, Tuple
+
+import cv2
+import numpy as np
+
+
+# cv2.imread() flags to decode straight to grayscale at a reduced resolution
+REDUCED_GRAYSCALE_FLAGS = {
+    1: cv2.IMREAD_GRAYSCALE,
+    2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    8: cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+
+def read_img(path: str, reduce_factor: int = 1) -> np.ndarray:
+    """Read image straight to grayscale, optionally at a reduced resolution
+    which JPEG images can decode directly to
+
+    Args:
+        path (str): path to the image
+        reduce_factor (int, optional): factor to reduce the width and height
+        of the image by, one of 1, 2, 4 or 8. Defaults to 1.
+
+    Raises:
+        ValueError: if reduce_factor is not supported
+        FileNotFoundError: if the image can not be read
+
+    Returns:
+        np.ndarray: grayscale image
+    """
+    if reduce_factor not in REDUCED_GRAYSCALE_FLAGS:
+        raise ValueError(
+            f"reduce_factor must be one of {list(REDUCED_GRAYSCALE_FLAGS)}"
+        )
+    img = cv2.imread(str(path), REDUCED_GRAYSCALE_FLAGS[reduce_factor])
+    if img is None:
+        raise FileNotFoundError(f"Unable to read image: {path}")
+    return img
+
+
+def is_pdf(path: str) -> bool:
+    """Check if file at path is a PDF document from its extension"""
+    return str(path).lower().endswith(".pdf")
+
+
+def page_count(path: str) -> int:
+    """Number of pages in a multi-page image (e.g. TIFF) or PDF document
+
+    Args:
+        path (str): path to the document
+
+    Returns:
+        int: number of pages, 1 for single page images
+    """
+    if is_pdf(path):
+        pdf = _import_pdf_rasterizer()
+        with pdf.open(path) as doc:
+            return doc.page_count
+    return cv2.imcount(str(path))
+
+
+def iter_pages(
+    path: str, dpi: int = 200, reduce_factor: int = 1
+) -> Iterator[Tuple[int, np.ndarray]]:
+    """Lazily read each page of a multi-page image (e.g. TIFF) or PDF
+    document straight to grayscale, only one page is decoded at a time so the
+    previous page can be released before the next one is read
+
+    Args:
+        path (str): path to the document
+        dpi (int, optional): resolution to render PDF pages at.
+        Defaults to 200.
+        reduce_factor (int, optional): factor to reduce the width and height
+        of each page by, see read_img(). Defaults to 1.
+
+    Yields:
+        Iterator[Tuple[int, np.ndarray]]: page index and grayscale image of
+        each page
+    """
+    if is_pdf(path):
+        yield from _iter_pdf_pages(path, dpi // reduce_factor)
+        return
+
+    n_pages = cv2.imcount(str(path))
+    if n_pages <= 1:
+        yield 0, read_img(path, reduce_factor)
+        return
+
+    for page_idx in range(n_pages):
+        # reduced flags are ignored for multi-page images so resize instead
+        success, imgs = cv2.imreadmulti(
+            str(path), page_idx, 1, flags=cv2.IMREAD_GRAYSCALE
+        )
+        if not success:
+            raise IOError(f"Unable to read page {page_idx} of {path}")
+        img = imgs[0]
+        if reduce_factor != 1:
+            img = cv2.resize(
+                img,
+                (img.shape[1] // reduce_factor, img.shape[0] // reduce_factor),
+                interpolation=cv2.INTER_AREA,
+            )
+        yield page_idx, img
+
+
+def _import_pdf_rasterizer():
+    """PyMuPDF is an optional dependency only needed to read PDF documents"""
+    try:
+        import pymupdf
+    except ImportError:
+        try:
+            # older releases are only importable as fitz
+            import fitz as pymupdf
+        except ImportError as e:
+            raise ImportError(
+                "Reading PDF documents requires PyMuPDF: pip install pymupdf"
+            ) from e
+    return pymupdf
+
+
+def _iter_pdf_pages(path: str, dpi: int) -> Iterator[Tuple[int, np.ndarray]]:
+    pdf = _import_pdf_rasterizer()
+
+    with pdf.open(path) as doc:
+        for page_idx, page in enumerate(doc):
+            pix = page.get_pixmap(dpi=dpi, colorspace=pdf.csGRAY, alpha=False)
+            img = np.frombuffer(pix.samples, dtype="uint8").reshape(
+                pix.height, pix.stride
+            )
+            yield page_idx, img[:, : pix.width].copy()
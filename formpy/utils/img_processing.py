@@ -1,8 +1,15 @@
 from __future__ import annotations
 
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Sequence, Tuple
+
 import cv2
 import numpy as np
 
+from formpy.utils.buffers import BufferPool
+from formpy.utils.scoring import circle_offsets
+
 
 class ImageAlignmentError(Exception):
     pass
@@ -29,8 +36,36 @@ def show_img(img: np.ndarray | list[np.ndarray], time: int = 0) -> None:
         cv2.destroyAllWindows()
 
 
+def draw_circles(
+    img: np.ndarray,
+    centres: np.ndarray,
+    radius: int,
+    colour: Tuple[int] = (0, 0, 255),
+) -> None:
+    """Draws filled circles on the image in place in one pass instead of
+    calling cv2.circle() for each circle
+
+    Args:
+        img (np.ndarray): colour image to draw on
+        centres (np.ndarray): (n, 2) array of x, y coordinates of the circle
+        centres
+        radius (int): radius of the circles
+        colour (Tuple[int], optional): colour of circles in BGR.
+        Defaults to (0, 0, 255).
+    """
+    dy, dx = circle_offsets(radius)
+    centres = np.asarray(centres, dtype=int).reshape(-1, 2)
+    ys = (centres[:, 1, None] + dy).ravel()
+    xs = (centres[:, 0, None] + dx).ravel()
+    inside = (ys >= 0) & (ys < img.shape[0]) & (xs >= 0) & (xs < img.shape[1])
+    img[ys[inside], xs[inside]] = colour
+
+
 def thresh_img(
-    img: np.ndarray, min_thresh: int = 100, max_thresh: int = 255
+    img: np.ndarray,
+    min_thresh: int = 100,
+    max_thresh: int = 255,
+    dst: np.ndarray | None = None,
 ) -> np.ndarray:
     """Convert image to binary black and white image using thresholds
 
@@ -41,18 +76,20 @@ def thresh_img(
         converted to white pixels . Defaults to 100.
         max_thresh (int, optional): Pixels above this grayscale value will be
         converted to black pixels. Defaults to 255.
+        dst (np.ndarray | None, optional): buffer with the same height and
+        width as img to write the thresholded image to. Defaults to None.
 
     Returns:
         np.ndarray: thresholded image with only black or white pixels
     """
     if len(img.shape) == 3 and img.shape[2] == 3:
         # three channels aka coloured img
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=dst)
     else:
         # img already greyscale
         img_gray = img
     _, img_thresh = cv2.threshold(
-        img_gray, min_thresh, max_thresh, cv2.THRESH_BINARY_INV
+        img_gray, min_thresh, max_thresh, cv2.THRESH_BINARY_INV, dst=dst
     )
 
     return img_thresh
@@ -99,11 +136,92 @@ def get_perspective_matrix(ordered_corner_pts: np.ndarray) -> np.ndarray:
     return dst
 
 
-def get_outer_box(img: np.ndarray) -> np.ndarray:
+def track_outer_box(
+    img: np.ndarray,
+    hint: np.ndarray,
+    search_radius: int = 25,
+    tolerance: float = 0.02,
+) -> np.ndarray | None:
+    """Finds the rectangle alignment feature by only searching small windows
+    around the corners found on a previous page e.g. consecutive pages from
+    the same document feeder
+
+    Args:
+        img (np.ndarray): image to detect the outer box from
+        hint (np.ndarray): 4 coordinates of the corners of the outer box on a
+        previous page, ordered from top-left clockwise (as returned from
+        get_outer_box())
+        search_radius (int, optional): half width of the window searched
+        around each corner in pixels. Defaults to 25.
+        tolerance (float, optional): maximum relative difference allowed
+        between the side lengths of the detected box and the hint box.
+        Defaults to 0.02.
+
+    Returns:
+        np.ndarray | None: 4 coordinates of the corners of the outer box
+        ordered from top-left clockwise, or None if the box could not be
+        verified near the hint corners
+    """
+    if len(img.shape) == 3:
+        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    else:
+        img_gray = img
+    height, width = img_gray.shape[:2]
+    hint = np.asarray(hint, dtype="float32")
+
+    pts = np.zeros((4, 2), dtype="float32")
+    for i, (hint_x, hint_y) in enumerate(hint):
+        x0 = max(int(hint_x) - search_radius, 0)
+        y0 = max(int(hint_y) - search_radius, 0)
+        x1 = min(int(hint_x) + search_radius + 1, width)
+        y1 = min(int(hint_y) + search_radius + 1, height)
+        if x1 - x0 < 3 or y1 - y0 < 3:
+            return None
+
+        # same enhancement as get_outer_box but only on the corner window
+        window = img_gray[y0:y1, x0:x1]
+        window_edge = cv2.Canny(cv2.bilateralFilter(window, 11, 500, 0), 20, 100)
+        ys, xs = np.nonzero(window_edge)
+        if len(xs) == 0:
+            return None
+
+        # same ordering as get_outer_box: sum of x+y for top left/bottom
+        # right and difference of y-x for top right/bottom left
+        corner_score = (xs + ys, ys - xs, -(xs + ys), xs - ys)[i]
+        idx = np.argmin(corner_score)
+        x, y = xs[idx], ys[idx]
+
+        # an extreme point on the window border means the box carries on
+        # outside of the window so the corner has not been found
+        if x in (0, x1 - x0 - 1) or y in (0, y1 - y0 - 1):
+            return None
+        pts[i] = (x0 + x, y0 + y)
+
+    # verify the detected box has the same shape as the hint box
+    sides = np.linalg.norm(pts - np.roll(pts, -1, axis=0), axis=1)
+    hint_sides = np.linalg.norm(hint - np.roll(hint, -1, axis=0), axis=1)
+    if np.any(np.abs(sides - hint_sides) > tolerance * hint_sides):
+        return None
+
+    return pts
+
+
+def get_outer_box(
+    img: np.ndarray,
+    hint: np.ndarray | None = None,
+    pool: BufferPool | None = None,
+) -> np.ndarray:
     """Finds the rectangle alignment feature in the image
 
     Args:
         img (np.ndarray): image to detect the outer box from
+        hint (np.ndarray | None, optional): corners of the outer box found on
+        a previous page, ordered from top-left clockwise. If provided, only
+        small windows around these corners are searched and the full page
+        detection is only used if the box cannot be verified near the hint.
+        Defaults to None.
+        pool (BufferPool | None, optional): pool to reuse the intermediate
+        images from. Defaults to None.
 
     Raises:
         ImageAlignmentError: if outer box is not detected
@@ -113,13 +231,23 @@ def get_outer_box(img: np.ndarray) -> np.ndarray:
         alignment feature,
         ordered from top-left clockwise
     """
+    if hint is not None:
+        pts = track_outer_box(img, hint)
+        if pts is not None:
+            return pts
+
     # enhance image to improve contour detection
+    shape = img.shape[:2]
     if len(img.shape) == 3:
-        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+        img_gray = cv2.cvtColor(
+            img, cv2.COLOR_BGR2GRAY, dst=pool and pool.get("gray", shape)
+        )
     else:
         img_gray = img
-    img_bilat = cv2.bilateralFilter(img_gray, 11, 500, 0)
-    img_edge = cv2.Canny(img_bilat, 20, 100)
+    img_bilat = cv2.bilateralFilter(
+        img_gray, 11, 500, 0, dst=pool and pool.get("bilateral", shape)
+    )
+    img_edge = cv2.Canny(img_bilat, 20, 100, edges=pool and pool.get("edges", shape))
 
     # find outer rectangle
 
@@ -176,9 +304,175 @@ def get_outer_box(img: np.ndarray) -> np.ndarray:
     return pts
 
 
-def align_page(img: np.ndarray, corner_pts: np.ndarray | None = None) -> np.ndarray:
+def detect_orientation(
+    img: np.ndarray,
+    corner_pts: np.ndarray,
+    marker_region: Tuple[float, float] = (0.01, 0.04),
+    min_fill: float = 0.5,
+) -> int:
+    """Detects the orientation of the page from a solid marker printed just
+    inside the top-left corner of the rectangle alignment feature. Only a
+    small grid of points inside each corner is sampled so the page does not
+    need to be warped.
+
+    Args:
+        img (np.ndarray): thresholded image (marker is white) e.g. from
+        thresh_img()
+        corner_pts (np.ndarray): 4 coordinates of the corners of the
+        rectangle alignment feature, ordered from top-left clockwise
+        marker_region (Tuple[float, float], optional): start and end of the
+        marker region inside the corner as a fraction of the box width and
+        height. Defaults to (0.01, 0.04).
+        min_fill (float, optional): minimum fraction of the marker region
+        that must be filled for the corner to be marked. Defaults to 0.5.
+
+    Returns:
+        int: number of clockwise quarter turns the page is rotated by.
+        0 if the marker is not found in exactly one corner.
+    """
+    start, end = marker_region
+    grid = np.linspace(start, end, 8, dtype="float32")
+    grid_x, grid_y = np.meshgrid(grid, grid)
+    # sample points for top left, top right, bottom right and bottom left in
+    # unit square coordinates of the outer box
+    region = np.stack([grid_x.ravel(), grid_y.ravel()], axis=1)
+    samples = np.concatenate(
+        [
+            region,
+            np.stack([1 - region[:, 0], region[:, 1]], axis=1),
+            1 - region,
+            np.stack([region[:, 0], 1 - region[:, 1]], axis=1),
+        ]
+    )
+
+    unit_square = np.array([[0, 0], [1, 0], [1, 1], [0, 1]], dtype="float32")
+    matrix = cv2.getPerspectiveTransform(
+        unit_square, np.asarray(corner_pts, dtype="float32")
+    )
+    img_pts = cv2.perspectiveTransform(samples[None], matrix)[0]
+    x = np.clip(np.rint(img_pts[:, 0]).astype(int), 0, img.shape[1] - 1)
+    y = np.clip(np.rint(img_pts[:, 1]).astype(int), 0, img.shape[0] - 1)
+
+    corner_fill = (img[y, x] > 0).reshape(4, -1).mean(axis=1)
+    marked_corners = np.flatnonzero(corner_fill >= min_fill)
+    if len(marked_corners) != 1:
+        return 0
+    return int(marked_corners[0])
+
+
+def rotate_corners(corner_pts: np.ndarray, quarter_turns: int) -> np.ndarray:
+    """Reorders corner points so that a page rotated clockwise by
+    quarter_turns is rotated upright when it is aligned
+
+    Args:
+        corner_pts (np.ndarray): 4 coordinates of the corners ordered from
+        the top-left of the image clockwise
+        quarter_turns (int): number of clockwise quarter turns the page is
+        rotated by e.g. from detect_orientation()
+
+    Returns:
+        np.ndarray: corners ordered from the top-left of the page clockwise
+    """
+    return np.roll(corner_pts, -quarter_turns, axis=0)
+
+
+@lru_cache(maxsize=None)
+def _aruco_detector(dictionary_id: int):
+    """Return a function that detects markers from the given predefined
+    dictionary, supporting both the old and new (>=4.7) cv2.aruco APIs"""
+    dictionary = cv2.aruco.getPredefinedDictionary(dictionary_id)
+    if hasattr(cv2.aruco, "ArucoDetector"):
+        detector = cv2.aruco.ArucoDetector(dictionary, cv2.aruco.DetectorParameters())
+        return detector.detectMarkers
+
+    parameters = cv2.aruco.DetectorParameters_create()
+    return lambda img: cv2.aruco.detectMarkers(img, dictionary, parameters=parameters)
+
+
+def get_fiducial_corners(
+    img: np.ndarray,
+    marker_ids: Sequence[int] = (0, 1, 2, 3),
+    dictionary_id: int = cv2.aruco.DICT_4X4_50,
+    roi_size: float = 0.2,
+) -> np.ndarray:
+    """Finds the corners of the page from ArUco fiducial markers placed in
+    each corner of the page. Markers are only searched for in a small region
+    of interest in each corner of the image.
+
+    Each marker identifies which corner of the page it belongs to, so the
+    returned corners follow the page orientation rather than the image, i.e.
+    an upside down or sideways page is rotated upright by align_page()
+
+    Args:
+        img (np.ndarray): image of form or template read into array
+        e.g. via cv2.imread()
+        marker_ids (Sequence[int], optional): ids of the markers placed on the
+        top-left, top-right, bottom-right and bottom-left corners of the page.
+        Defaults to (0, 1, 2, 3).
+        dictionary_id (int, optional): predefined cv2.aruco dictionary the
+        markers are from. Defaults to cv2.aruco.DICT_4X4_50.
+        roi_size (float, optional): size of the corner regions searched for
+        markers as a fraction of the image width and height. Defaults to 0.2.
+
+    Raises:
+        ImageAlignmentError: if any of the markers are not detected
+
+    Returns:
+        np.ndarray: 4 coordinates of the outer corners of the markers, ordered
+        from the top-left of the page clockwise
+    """
+    if len(img.shape) == 3:
+        img_gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+    else:
+        img_gray = img
+    height, width = img_gray.shape[:2]
+    roi_width = int(width * roi_size)
+    roi_height = int(height * roi_size)
+    detect_markers = _aruco_detector(dictionary_id)
+
+    found = {}
+    for x0, y0 in (
+        (0, 0),
+        (width - roi_width, 0),
+        (width - roi_width, height - roi_height),
+        (0, height - roi_height),
+    ):
+        roi = img_gray[y0 : y0 + roi_height, x0 : x0 + roi_width]
+        # markers are white on black on thresholded (inverted) images
+        for roi_img in (roi, cv2.bitwise_not(roi)):
+            marker_corners, ids, _ = detect_markers(roi_img)
+            if ids is not None and any(i in marker_ids for i in ids.flatten()):
+                break
+        if ids is None:
+            continue
+        for corners, marker_id in zip(marker_corners, ids.flatten()):
+            found[int(marker_id)] = corners.reshape(4, 2) + (x0, y0)
+
+    pts = np.zeros((4, 2), dtype="float32")
+    for i, marker_id in enumerate(marker_ids):
+        if marker_id not in found:
+            raise ImageAlignmentError(
+                f"Image Alignment Failed: fiducial marker {marker_id} not detected"
+            )
+        # marker corners are ordered clockwise from the top left of the
+        # marker, so use the corner that points to the same page corner
+        pts[i] = found[marker_id][i]
+
+    return pts
+
+
+def align_page(
+    img: np.ndarray,
+    corner_pts: np.ndarray | None = None,
+    hint: np.ndarray | None = None,
+    alignment: str = "outer_box",
+    detect_rotation: bool = False,
+    dst: np.ndarray | None = None,
+    pool: BufferPool | None = None,
+    return_corners: bool = False,
+) -> np.ndarray | Tuple[np.ndarray, np.ndarray]:
     """Applys perspective transform to align the image using a rectangle
-    alignment feature on the image
+    alignment feature or fiducial markers on the image
 
     Args:
         img (np.ndarray): image of form or template read into array
@@ -187,49 +481,204 @@ def align_page(img: np.ndarray, corner_pts: np.ndarray | None = None) -> np.ndar
         of the rectangle alignment feature,
         ordered from top-left clockwise. Defaults to None, and the rectangle
         feature will be detected automatically.
+        hint (np.ndarray | None, optional): corners of the outer box on a
+        previous page used to speed up detection when corner_pts is not
+        provided, see get_outer_box(). Defaults to None.
+        alignment (str, optional): feature used to detect the corners when
+        corner_pts is not provided, either "outer_box" for the rectangle
+        alignment feature or "fiducial" for ArUco markers in each corner, see
+        get_fiducial_corners(). Defaults to "outer_box".
+        detect_rotation (bool, optional): rotate sideways or upside down pages
+        upright using a marker in the top-left corner of the outer box, see
+        detect_orientation(). img must be thresholded. Fiducial alignment
+        always rotates the page upright. Defaults to False.
+        dst (np.ndarray | None, optional): buffer at least as large as the
+        aligned image, the aligned image is written to a view of it.
+        Defaults to None.
+        pool (BufferPool | None, optional): pool to reuse the intermediate
+        images of outer box detection from. Defaults to None.
+        return_corners (bool, optional): also return the corners the page was
+        aligned with, to use as the hint for the next page.
+        Defaults to False.
+
+    Raises:
+        ValueError: if alignment is not one of "outer_box" or "fiducial"
 
     Returns:
-        np.ndarray: aligned image
+        np.ndarray | Tuple[np.ndarray, np.ndarray]: aligned image, and the
+        corners found on img before any rotation if return_corners is true
     """
 
     if corner_pts is not None:
         ordered_pts = corner_pts
+    elif alignment == "outer_box":
+        ordered_pts = get_outer_box(img, hint=hint, pool=pool)
+    elif alignment == "fiducial":
+        ordered_pts = get_fiducial_corners(img)
     else:
-        ordered_pts = get_outer_box(img)
+        raise ValueError(f"Unknown alignment method: {alignment}")
+    found_pts = ordered_pts
+
+    if detect_rotation and alignment == "outer_box":
+        # rotating the corners rotates the page within the same warp
+        quarter_turns = detect_orientation(img, ordered_pts)
+        ordered_pts = rotate_corners(ordered_pts, quarter_turns)
 
-    dst = get_perspective_matrix(ordered_pts)
+    dst_pts = get_perspective_matrix(ordered_pts)
 
-    width = int(dst[2][0])
-    height = int(dst[2][1])
+    width = int(dst_pts[2][0])
+    height = int(dst_pts[2][1])
 
     # transformation matrix
-    matrix = cv2.getPerspectiveTransform(ordered_pts, dst)
+    matrix = cv2.getPerspectiveTransform(ordered_pts, dst_pts)
 
     # transform image and resize to original size
     # (map spots to correct locations)
-    img_warp = cv2.warpPerspective(img, matrix, (width, height))
+    if dst is not None:
+        dst = dst[:height, :width]
+    img_warp = cv2.warpPerspective(img, matrix, (width, height), dst=dst)
 
-    # TODO add rotation feature (separate func probably) -
-    # TODO add detection mechanism for choosing rotation
-    # e.g. top left spot or something
+    if return_corners:
+        return img_warp, found_pts
+    return img_warp
 
-    # if img_warp.shape[0] > img_warp.shape[1]:
-    #     img_warp = cv2.rotate(img_warp, cv2.ROTATE_90_CLOCKWISE)
 
-    return img_warp
+def match_offset(
+    img: np.ndarray,
+    reference: np.ndarray,
+    bbox: np.ndarray,
+    search: int = 10,
+    min_score: float = 0.5,
+) -> Tuple[int, int]:
+    """Finds the offset of a region of an aligned image from the same region
+    of a reference image by template matching in a small search window
 
+    Args:
+        img (np.ndarray): aligned image e.g. Form.img
+        reference (np.ndarray): aligned reference image with the same size
+        bbox (np.ndarray): x0, y0, x1, y1 coordinates of the region
+        search (int, optional): maximum offset in pixels searched in each
+        direction. Defaults to 10.
+        min_score (float, optional): minimum normalised correlation for the
+        match to be used. Defaults to 0.5.
 
-def process_img(img: np.ndarray) -> np.ndarray:
+    Returns:
+        Tuple[int, int]: x, y offset of the region, (0, 0) if no match scores
+        at least min_score
+    """
+    height, width = img.shape[:2]
+    x0, y0 = max(bbox[0], 0), max(bbox[1], 0)
+    x1, y1 = min(bbox[2], width), min(bbox[3], height)
+    patch = reference[y0:y1, x0:x1]
+
+    search_x0, search_y0 = max(x0 - search, 0), max(y0 - search, 0)
+    search_region = img[
+        search_y0 : min(y1 + search, height), search_x0 : min(x1 + search, width)
+    ]
+    if patch.size == 0 or search_region.shape[0] < patch.shape[0]:
+        return 0, 0
+    patch_min, patch_max, _, _ = cv2.minMaxLoc(patch)
+    if patch_min == patch_max:
+        # nothing to match in regions with no detail
+        return 0, 0
+
+    result = cv2.matchTemplate(search_region, patch, cv2.TM_CCOEFF_NORMED)
+    _, max_score, _, max_loc = cv2.minMaxLoc(result)
+    if max_score < min_score:
+        return 0, 0
+    return max_loc[0] + search_x0 - x0, max_loc[1] + search_y0 - y0
+
+
+def local_offsets(
+    img: np.ndarray,
+    reference: np.ndarray,
+    bboxes: np.ndarray,
+    search: int = 10,
+    min_score: float = 0.5,
+    workers: int = 1,
+    executor: Executor | None = None,
+) -> np.ndarray:
+    """Finds the offset of each region of an aligned image from a reference
+    image to correct local misalignment e.g. from curled pages, see
+    match_offset()
+
+    Args:
+        img (np.ndarray): aligned image e.g. Form.img
+        reference (np.ndarray): aligned reference image with the same size
+        bboxes (np.ndarray): (n, 4) array of x0, y0, x1, y1 coordinates of each
+        region e.g. Template.question_bboxes
+        search (int, optional): maximum offset in pixels. Defaults to 10.
+        min_score (float, optional): minimum normalised correlation for the
+        match to be used. Defaults to 0.5.
+        workers (int, optional): number of threads to match regions in
+        parallel with (cv2.matchTemplate releases the GIL). Defaults to 1.
+        executor (Executor | None, optional): thread pool to reuse across
+        calls when workers > 1. Defaults to None, and a pool is created for
+        the call.
+
+    Returns:
+        np.ndarray: (n, 2) array of x, y offsets of each region
+    """
+
+    def offset(bbox: np.ndarray) -> Tuple[int, int]:
+        return match_offset(img, reference, bbox, search, min_score)
+
+    if workers > 1 and executor is not None:
+        offsets = list(executor.map(offset, bboxes))
+    elif workers > 1:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            offsets = list(executor.map(offset, bboxes))
+    else:
+        offsets = [offset(bbox) for bbox in bboxes]
+    return np.array(offsets, dtype=int).reshape(-1, 2)
+
+
+def process_img(
+    img: np.ndarray,
+    alignment: str = "outer_box",
+    detect_rotation: bool = False,
+    pool: BufferPool | None = None,
+    hint: np.ndarray | None = None,
+    return_corners: bool = False,
+) -> np.ndarray | Tuple[np.ndarray, np.ndarray]:
     """Converts image to binary black & white and aligns the page using the
-    rectangle alignment feature
+    rectangle alignment feature or fiducial markers
 
     Args:
         img (np.ndarray): image read into array e.g. via cv2.imread()
+        alignment (str, optional): "outer_box" or "fiducial", see
+        align_page(). Defaults to "outer_box".
+        detect_rotation (bool, optional): rotate pages upright using a marker
+        in the top-left corner of the outer box, see align_page().
+        Defaults to False.
+        pool (BufferPool | None, optional): pool to reuse the intermediate
+        images from, the returned image is also a view of a buffer in the pool
+        so is overwritten when the pool is next used. Defaults to None.
+        hint (np.ndarray | None, optional): corners of the outer box on a
+        previous page to track instead of detecting the box on the whole page,
+        see get_outer_box(). Defaults to None.
+        return_corners (bool, optional): also return the corners the page was
+        aligned with, see align_page(). Defaults to False.
 
     Returns:
-        np.ndarray: binary black and white, aligned image
+        np.ndarray | Tuple[np.ndarray, np.ndarray]: binary black and white,
+        aligned image, and the corners found if return_corners is true
     """
 
-    img_thresh = thresh_img(img)
-    img_aligned = align_page(img_thresh)
-    return img_aligned
+    shape = img.shape[:2]
+    img_thresh = thresh_img(img, dst=pool and pool.get("thresh", shape))
+    corner_pts = None
+    if alignment == "fiducial":
+        # detect markers before thresholding to keep their original contrast
+        corner_pts = get_fiducial_corners(img)
+    return align_page(
+        img_thresh,
+        corner_pts,
+        hint=hint,
+        alignment=alignment,
+        detect_rotation=detect_rotation,
+        # square buffer so sideways pages fit once rotated upright
+        dst=pool and pool.get("warp", (max(shape), max(shape))),
+        pool=pool,
+        return_corners=return_corners,
+    )
@@ -0,0 +1,187 @@
+from __future__ import annotations
+
+import base64
+
+import numpy as np
+
+# version of the template schema written by Template.to_dict()
+SCHEMA_VERSION = 2
+
+
+def encode_array(arr: np.ndarray, dtype: str) -> str:
+    """Pack an array into a base64 string of its little-endian bytes
+
+    Args:
+        arr (np.ndarray): array to pack
+        dtype (str): little-endian data type to store the values as
+        e.g. "<i4"
+
+    Returns:
+        str: base64 encoded bytes of the array
+    """
+    data = np.ascontiguousarray(arr, dtype=dtype).tobytes()
+    return base64.b64encode(data).decode("ascii")
+
+
+def decode_array(data: str, dtype: str, shape: tuple = (-1,)) -> np.ndarray:
+    """Unpack an array packed with encode_array() without copying the decoded
+    bytes
+
+    Args:
+        data (str): base64 encoded bytes of the array
+        dtype (str): little-endian data type the values are stored as
+        shape (tuple, optional): shape of the array. Defaults to (-1,).
+
+    Returns:
+        np.ndarray: read-only array in native byte order
+    """
+    arr = np.frombuffer(base64.b64decode(data), dtype=dtype).reshape(shape)
+    return arr.astype(np.dtype(dtype).newbyteorder("="), copy=False)
+
+
+def pack_template(
+    radius: int,
+    alignment: str,
+    detect_rotation: bool,
+    question_ids: np.ndarray,
+    multiple: np.ndarray,
+    n_answers: np.ndarray,
+    values: list[str],
+    coords: np.ndarray,
+    thresholds: np.ndarray,
+    centres: np.ndarray | None = None,
+) -> dict:
+    """Create the template config dictionary with the answers of all
+    questions packed into arrays. Answers of each question are next to each
+    other in question order.
+
+    Args:
+        radius (int): radius of the answer circles
+        alignment (str): "outer_box" or "fiducial", see Template.__init__
+        detect_rotation (bool): see Template.__init__
+        question_ids (np.ndarray): id of each question
+        multiple (np.ndarray): true/false flag for multiple answers of each
+        question
+        n_answers (np.ndarray): number of answers of each question
+        values (list[str]): value of each answer
+        coords (np.ndarray): (n, 2) array of x, y coordinates of each answer
+        thresholds (np.ndarray): filled threshold of each answer
+        centres (np.ndarray | None, optional): (n, 2) array of sub-pixel x, y
+        centres of each answer. Defaults to None.
+
+    Returns:
+        dict: template config as shown below, arrays are packed with
+        encode_array()
+
+    .. code-block:: python
+
+        {"version": 2,
+            "config":
+                {"radius": <CIRCLE_RADIUS>,
+                "alignment": "<outer_box|fiducial>",
+                "detect_rotation": <BOOL>},
+            "questions":
+                {"ids": [<QUESTION_ID>],
+                "multiple": [<BOOL>],
+                "n_answers": [<NUMBER_OF_ANSWERS>]},
+            "answers":
+                {"values": ["<ANSWER_VAL>"],
+                "coords": "<BASE64 INT32 X, Y PAIRS>",
+                "thresholds": "<BASE64 FLOAT64>",
+                "centres": "<BASE64 FLOAT64 X, Y PAIRS>"}
+            }
+    """
+    answers = {
+        "values": [str(value) for value in values],
+        "coords": encode_array(coords, "<i4"),
+        "thresholds": encode_array(thresholds, "<f8"),
+    }
+    if centres is not None:
+        answers["centres"] = encode_array(centres, "<f8")
+
+    return {
+        "version": SCHEMA_VERSION,
+        "config": {
+            "radius": int(radius),
+            "alignment": alignment,
+            "detect_rotation": bool(detect_rotation),
+        },
+        "questions": {
+            "ids": np.asarray(question_ids, dtype=int).tolist(),
+            "multiple": np.asarray(multiple, dtype=bool).tolist(),
+            "n_answers": np.asarray(n_answers, dtype=int).tolist(),
+        },
+        "answers": answers,
+    }
+
+
+def unpack_template(template: dict) -> dict:
+    """Read the packed arrays from a template config dictionary of any
+    schema version, the original (version 1) config with a dictionary for
+    each answer is also supported
+
+    Args:
+        template (dict): template config e.g. from Template.to_dict()
+
+    Raises:
+        ValueError: if the schema version is not supported or the number of
+        answers does not match
+
+    Returns:
+        dict: arguments of pack_template()
+    """
+    version = template.get("version", 1)
+    if version == 1:
+        return _unpack_template_v1(template)
+    if version != SCHEMA_VERSION:
+        raise ValueError(f"Unsupported template schema version: {version}")
+
+    config = template["config"]
+    questions = template["questions"]
+    answers = template["answers"]
+    unpacked = {
+        "radius": config["radius"],
+        "alignment": config.get("alignment", "outer_box"),
+        "detect_rotation": config.get("detect_rotation", False),
+        "question_ids": np.array(questions["ids"], dtype=int),
+        "multiple": np.array(questions["multiple"], dtype=bool),
+        "n_answers": np.array(questions["n_answers"], dtype=int),
+        "values": answers["values"],
+        "coords": decode_array(answers["coords"], "<i4", (-1, 2)),
+        "thresholds": decode_array(answers["thresholds"], "<f8"),
+        "centres": None,
+    }
+    if "centres" in answers:
+        unpacked["centres"] = decode_array(answers["centres"], "<f8", (-1, 2))
+
+    n_answers = unpacked["n_answers"].sum()
+    sizes = [len(unpacked["values"]), len(unpacked["coords"])]
+    sizes.append(len(unpacked["thresholds"]))
+    if unpacked["centres"] is not None:
+        sizes.append(len(unpacked["centres"]))
+    if any(size != n_answers for size in sizes):
+        raise ValueError(
+            f"Expected {n_answers} answers from questions, got {sizes} "
+            "values, coords, thresholds and centres"
+        )
+    return unpacked
+
+
+def _unpack_template_v1(template: dict) -> dict:
+    questions = template["questions"]
+    answers = [ans for qn in questions.values() for ans in qn["answers"]]
+    return {
+        "radius": template["config"]["radius"],
+        "alignment": template["config"].get("alignment", "outer_box"),
+        "detect_rotation": template["config"].get("detect_rotation", False),
+        "question_ids": np.array([int(i) for i in questions], dtype=int),
+        "multiple": np.array([qn["multiple"] for qn in questions.values()], bool),
+        "n_answers": np.array([len(qn["answers"]) for qn in questions.values()]),
+        "values": [ans["answer_val"] for ans in answers],
+        "coords": np.array(
+            [ans["answer_coords"] for ans in answers], dtype=int
+        ).reshape(-1, 2),
+        # version 1 does not store thresholds so use the Answer default
+        "thresholds": np.full(len(answers), 0.8),
+        "centres": None,
+    }
@@ -0,0 +1,247 @@
+from __future__ import annotations
+
+from concurrent.futures import Executor, ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Tuple
+
+import cv2
+import numpy as np
+
+
+@lru_cache(maxsize=None)
+def circle_offsets(radius: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Pixel offsets from the centre of a filled circle, drawn with
+    cv2.circle() so the pixels match Answer.calc_filled_perc()
+
+    Args:
+        radius (int): radius of the circle
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: y and x offsets of each pixel in the
+        circle
+    """
+    mask = np.zeros((2 * radius + 1, 2 * radius + 1), dtype="uint8")
+    cv2.circle(mask, (radius, radius), radius, 255, -1)
+    dy, dx = np.nonzero(mask)
+    return dy - radius, dx - radius
+
+
+def _score_chunks(
+    score: Callable[..., np.ndarray],
+    workers: int,
+    executor: Executor | None,
+    *arrays: np.ndarray,
+) -> np.ndarray:
+    """Split the answers into one chunk per worker and score the chunks
+    concurrently in threads, NumPy releases the GIL while indexing and
+    summing so the chunks run in parallel
+
+    Args:
+        score (Callable[..., np.ndarray]): function to score a chunk of
+        answers, called with a chunk of each array
+        workers (int): number of chunks
+        executor (Executor | None): thread pool to score the chunks in, a
+        pool is created for this call if None
+        arrays (np.ndarray): arrays with the answers along the first axis
+
+    Returns:
+        np.ndarray: scores of all chunks concatenated in the original order
+    """
+    chunks = zip(*(np.array_split(arr, workers) for arr in arrays))
+    if executor is None:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            scores = list(executor.map(lambda chunk: score(*chunk), chunks))
+    else:
+        scores = list(executor.map(lambda chunk: score(*chunk), chunks))
+    return np.concatenate(scores)
+
+
+def fill_ratios(
+    img: np.ndarray,
+    centres: np.ndarray,
+    radius: int,
+    workers: int = 1,
+    executor: Executor | None = None,
+) -> np.ndarray:
+    """Calculate the filled percentage of every answer circle in one pass
+
+    Args:
+        img (np.ndarray): thresholded and aligned form image e.g. Form.img
+        centres (np.ndarray): (n, 2) array of x, y coordinates of the answer
+        centres e.g. Template.answer_coords
+        radius (int): radius of the answer circles
+        workers (int, optional): number of threads to score the answers in
+        parallel with. Defaults to 1.
+        executor (Executor | None, optional): thread pool to reuse across
+        calls when workers > 1, so threads are not started for every form.
+        Defaults to None, and a pool is created for the call.
+
+    Returns:
+        np.ndarray: (n,) array with range from 0.0 - 1.0 representing
+        percentage of each circle filled in, same as
+        Answer.calc_filled_perc()
+    """
+    centres = np.asarray(centres, dtype=int)
+    if workers > 1 and len(centres) > 1:
+        return _score_chunks(
+            lambda chunk: fill_ratios(img, chunk, radius), workers, executor, centres
+        )
+
+    dy, dx = circle_offsets(radius)
+    ys = centres[:, 1, None] + dy
+    xs = centres[:, 0, None] + dx
+
+    # only count pixels of circles that are inside the image
+    inside = (ys >= 0) & (ys < img.shape[0]) & (xs >= 0) & (xs < img.shape[1])
+    ys = np.clip(ys, 0, img.shape[0] - 1)
+    xs = np.clip(xs, 0, img.shape[1] - 1)
+
+    filled = (img[ys, xs] > 0) & inside
+    return filled.sum(axis=1) / inside.sum(axis=1)
+
+
+def question_confidence(
+    fill_ratios: np.ndarray,
+    question_ids: np.ndarray,
+    thresholds: np.ndarray,
+    multiple: np.ndarray,
+    min_margin: float = 0.1,
+    blank_level: float = 0.2,
+) -> dict[str, np.ndarray]:
+    """Calculate how confidently each question was scored from the fill ratios
+    of its answers, so only uncertain forms need to be reviewed
+
+    Args:
+        fill_ratios (np.ndarray): (n_answers,) or (n_forms, n_answers) array
+        of fill ratios e.g. Form.fill_ratios
+        question_ids (np.ndarray): question id of each answer, answers of the
+        same question must be next to each other
+        thresholds (np.ndarray): filled threshold of each answer
+        multiple (np.ndarray): true/false flag for multiple answers of each
+        question, in the order the questions appear in question_ids
+        min_margin (float, optional): fill ratios closer than this to the
+        threshold are ambiguous e.g. nearly filled answers. Defaults to 0.1.
+        blank_level (float, optional): fill ratios between this and the
+        threshold are partially filled e.g. half filled or erased answers,
+        empty answer circles are below it. Defaults to 0.2.
+
+    Returns:
+        dict[str, np.ndarray]: arrays with the last axis for each question:
+        "margin" between the two most filled answers, "partial" if any answer
+        is partially filled, "ambiguous" if more than one answer is filled on
+        a question without multiple answers, any answer is close to the
+        threshold or partially filled, "blank" if no answers are filled
+    """
+    fill_ratios = np.asarray(fill_ratios)
+    thresholds = np.broadcast_to(thresholds, fill_ratios.shape[-1:])
+    question_ids = np.asarray(question_ids)
+    starts = np.flatnonzero(np.r_[True, question_ids[1:] != question_ids[:-1]])
+    ends = np.r_[starts[1:], len(question_ids)]
+
+    margin = np.empty((*fill_ratios.shape[:-1], len(starts)))
+    n_filled = np.empty(margin.shape, dtype=int)
+    uncertain = np.empty(margin.shape, dtype=bool)
+    partial = np.empty(margin.shape, dtype=bool)
+    for i, (start, end) in enumerate(zip(starts, ends)):
+        ratios = fill_ratios[..., start:end]
+        top_two = np.sort(ratios, axis=-1)[..., -2:]
+        margin[..., i] = top_two[..., -1] - (top_two[..., 0] if end - start > 1 else 0)
+        n_filled[..., i] = np.count_nonzero(ratios >= thresholds[start:end], axis=-1)
+        uncertain[..., i] = np.any(
+            np.abs(ratios - thresholds[start:end]) < min_margin, axis=-1
+        )
+        partial[..., i] = np.any(
+            (ratios >= blank_level) & (ratios < thresholds[start:end]), axis=-1
+        )
+
+    multiple_marked = (n_filled > 1) & ~np.asarray(multiple, dtype=bool)
+    return {
+        "margin": margin,
+        "partial": partial,
+        "ambiguous": multiple_marked | uncertain | partial,
+        "blank": n_filled == 0,
+    }
+
+
+def circle_kernels(
+    centres: np.ndarray, radius: float, scale: float = 1.0
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Anti-aliased weight kernels of answer circles with sub-pixel centres,
+    each pixel is weighted by how much of it is covered by the circle
+
+    Args:
+        centres (np.ndarray): (n, 2) array of x, y coordinates of the answer
+        centres, can be fractional
+        radius (float): radius of the answer circles
+        scale (float, optional): scale of the image the kernels are used on
+        relative to the centres e.g. 0.5 for a page at half resolution.
+        Defaults to 1.0.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (n, 2) array of x, y coordinates of the
+        top left pixel of each kernel and (n, k, k) array of kernel weights
+    """
+    centres = np.asarray(centres, dtype="float64").reshape(-1, 2) * scale
+    radius = radius * scale
+    size = int(np.ceil(2 * radius)) + 3
+    # pixel centres are at integer coordinates
+    origins = np.floor(centres - radius).astype(int) - 1
+
+    grid = np.arange(size)
+    dx = origins[:, 0, None] + grid - centres[:, 0, None]
+    dy = origins[:, 1, None] + grid - centres[:, 1, None]
+    dist = np.sqrt(dy[:, :, None] ** 2 + dx[:, None, :] ** 2)
+    kernels = np.clip(radius + 0.5 - dist, 0, 1).astype("float32")
+
+    return origins, kernels
+
+
+def weighted_fill_ratios(
+    img: np.ndarray,
+    origins: np.ndarray,
+    kernels: np.ndarray,
+    workers: int = 1,
+    executor: Executor | None = None,
+) -> np.ndarray:
+    """Calculate the filled percentage of every answer circle using
+    anti-aliased weight kernels, which are less sensitive to small
+    misalignments than hard edged circles so can also be used on
+    downscaled pages
+
+    Args:
+        img (np.ndarray): thresholded and aligned form image e.g. Form.img
+        origins (np.ndarray): (n, 2) array of x, y coordinates of the top left
+        pixel of each kernel e.g. from circle_kernels()
+        kernels (np.ndarray): (n, k, k) array of kernel weights
+        workers (int, optional): number of threads to score the answers in
+        parallel with. Defaults to 1.
+        executor (Executor | None, optional): thread pool to reuse across
+        calls when workers > 1, so threads are not started for every form.
+        Defaults to None, and a pool is created for the call.
+
+    Returns:
+        np.ndarray: (n,) array with range from 0.0 - 1.0 representing
+        percentage of each circle filled in
+    """
+    if workers > 1 and len(origins) > 1:
+        return _score_chunks(
+            lambda *chunk: weighted_fill_ratios(img, *chunk),
+            workers,
+            executor,
+            origins,
+            kernels,
+        )
+
+    size = kernels.shape[-1]
+    grid = np.arange(size)
+    ys = (origins[:, 1, None] + grid)[:, :, None]
+    xs = (origins[:, 0, None] + grid)[:, None, :]
+
+    # only count pixels of circles that are inside the image
+    inside = (ys >= 0) & (ys < img.shape[0]) & (xs >= 0) & (xs < img.shape[1])
+    ys = np.clip(ys, 0, img.shape[0] - 1)
+    xs = np.clip(xs, 0, img.shape[1] - 1)
+
+    weights = kernels * inside
+    filled = (img[ys, xs] > 0) * weights
+    return filled.sum(axis=(1, 2)) / weights.sum(axis=(1, 2))
@@ -50,3 +50,36 @@ def find_spots(
     sortedSpots = sorted(spotCentres, key=lambda x: (x[0], x[1]), reverse=False)
 
     return sortedSpots
+
+
+def refine_centres(img: np.ndarray, centres: np.ndarray, radius: int) -> np.ndarray:
+    """Refine the centres of filled answer circles to sub-pixel accuracy using
+    the image moments of a window around each circle
+
+    Args:
+        img (np.ndarray): thresholded template image with all answers filled
+        in (answers are white) e.g. Template.img
+        centres (np.ndarray): (n, 2) array of approximate x, y coordinates of
+        the answer centres e.g. from find_spots()
+        radius (int): radius of the answer circles
+
+    Returns:
+        np.ndarray: (n, 2) array of refined x, y coordinates, centres with no
+        filled pixels around them are not changed
+    """
+    centres = np.asarray(centres, dtype=int).reshape(-1, 2)
+    refined = centres.astype("float64")
+    # small margin so circles slightly off their centre are not cut off
+    half_width = radius + 2
+
+    for i, (x, y) in enumerate(centres):
+        x0, y0 = max(x - half_width, 0), max(y - half_width, 0)
+        window = img[y0 : y + half_width + 1, x0 : x + half_width + 1]
+        moments = cv2.moments(window, binaryImage=True)
+        if moments["m00"] > 0:
+            refined[i] = (
+                x0 + moments["m10"] / moments["m00"],
+                y0 + moments["m01"] / moments["m00"],
+            )
+
+    return refined
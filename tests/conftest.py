@@ -1,4 +1,5 @@
 import cv2
+import numpy as np
 import pytest
 from formpy.form import Form
 from formpy.template import Template
@@ -23,3 +24,19 @@ def form(template_from_json):
     form_img_path = OEE_FILLED_FORM
     form = Form(cv2.imread(form_img_path), template)
     return form
+
+
+@pytest.fixture
+def fiducial_page():
+    """returns blank page with ArUco markers 0-3 in each corner clockwise from
+    the top left and a single filled spot"""
+    dictionary = cv2.aruco.getPredefinedDictionary(cv2.aruco.DICT_4X4_50)
+    # renamed in opencv 4.7
+    draw_marker = getattr(cv2.aruco, "generateImageMarker", None)
+    if draw_marker is None:
+        draw_marker = cv2.aruco.drawMarker
+    page = np.full((1000, 1400), 255, dtype="uint8")
+    for marker_id, (x, y) in enumerate([(40, 40), (1260, 40), (1260, 860), (40, 860)]):
+        page[y : y + 100, x : x + 100] = draw_marker(dictionary, marker_id, 100)
+    cv2.circle(page, (300, 300), 20, 0, -1)
+    return page
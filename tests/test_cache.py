@@ -0,0 +1,104 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+from formpy.cache import ResultCache
+from formpy.form import Form
+from formpy.utils import img_processing
+
+from .paths import OEE_FILLED_FORM
+
+
+def test_cache_form(template_from_json, form, monkeypatch):
+    cache = ResultCache()
+    img = cv2.imread(OEE_FILLED_FORM)
+    scored_form = Form(img, template_from_json, cache=cache)
+    assert len(cache) == 0
+    assert np.array_equal(scored_form.fill_ratios, form.fill_ratios)
+    assert len(cache) == 1
+
+    def process_img(*args, **kwargs):
+        raise AssertionError("cached form should not be processed")
+
+    with monkeypatch.context() as m:
+        m.setattr(img_processing, "process_img", process_img)
+        cached_form = Form(img.copy(), template_from_json, cache=cache)
+        assert np.array_equal(cached_form.fill_ratios, form.fill_ratios)
+        assert cached_form.find_answers() == form.find_answers()
+
+    # image is processed when it is first used
+    assert np.array_equal(cached_form.img, form.img)
+
+
+def test_cache_key(template_from_json, form):
+    img = cv2.imread(OEE_FILLED_FORM)
+    key = ResultCache.key(img, template_from_json)
+    assert ResultCache.key(img.copy(), template_from_json) == key
+
+    changed_img = img.copy()
+    changed_img[0, 0] += 1
+    assert ResultCache.key(changed_img, template_from_json) != key
+    assert ResultCache.key(img[:, :, 0], template_from_json) != key
+
+    template_from_json.refine_answer_centres()
+    assert ResultCache.key(img, template_from_json) != key
+
+
+def test_cache_evict_lru():
+    cache = ResultCache(max_entries=2)
+    cache.put("a", np.zeros(10))
+    cache.put("b", np.zeros(10))
+    cache.get("a")
+    cache.put("c", np.zeros(10))
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") is not None
+
+    # each result is 80 bytes
+    cache = ResultCache(max_entries=None, max_bytes=200)
+    for key in "abcd":
+        cache.put(key, np.zeros(10))
+    assert len(cache) == 2
+    assert cache.get("a") is None
+    assert cache.get("d") is not None
+
+
+def test_cache_persist(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    fill_ratios = np.linspace(0, 1, 7)
+    with ResultCache(path) as cache:
+        cache.put("a", fill_ratios)
+
+    with ResultCache(path) as cache:
+        assert np.array_equal(cache.get("a"), fill_ratios)
+        cache.clear()
+        assert len(cache) == 0
+
+
+def test_cache_threads(tmp_path):
+    cache = ResultCache(tmp_path / "cache.sqlite", flush_uses=5)
+
+    def use_cache(thread_idx):
+        for i in range(20):
+            key = f"{thread_idx}-{i}"
+            cache.put(key, np.full(4, i, dtype=float))
+            assert np.array_equal(cache.get(key), np.full(4, i))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(use_cache, range(8)))
+    assert len(cache) == 160
+    cache.close()
+
+
+def test_cache_batched_uses(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    with ResultCache(path, max_entries=2) as cache:
+        cache.put("a", np.zeros(3))
+        cache.put("b", np.zeros(3))
+        # use of a is only recorded in memory until the cache is closed
+        cache.get("a")
+
+    with ResultCache(path, max_entries=2) as cache:
+        cache.put("c", np.zeros(3))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None
@@ -1,3 +1,16 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+import pytest
+from formpy.form import Form
+from formpy.question import Question
+from formpy.utils import img_processing
+from formpy.utils.buffers import BufferPool
+
+from .paths import OEE_FILLED_FORM, OEE_TEMPLATE_JPG
+
+
 def test_answer_check_fill(form):
     ans = form.questions[0].answers[20]
     assert ans.is_filled(form.img)
@@ -7,3 +20,217 @@ def test_answer_check_fill_perc(form):
     ans = form.questions[1].answers[268]
     fill_perc = ans.calc_filled_perc(form.img)
     assert round(fill_perc, 2) == 0.81
+
+
+def test_fill_ratios(form):
+    fill_percs = [ans.calc_filled_perc(form.img) for ans in form.template.answers]
+    assert np.array_equal(form.fill_ratios, fill_percs)
+
+
+def test_find_answers(form):
+    answers = form.find_answers()
+    for qn in form.questions:
+        assert answers[qn.question_id] == qn.find_answers(form.img)
+
+
+def test_mark_all_answers(form):
+    colour_img = cv2.cvtColor(cv2.bitwise_not(form.img), cv2.COLOR_GRAY2BGR)
+    for qn in form.questions:
+        for ans in qn.answers:
+            cv2.putText(
+                colour_img,
+                str(qn.question_id) + ans.value,
+                (ans.x, ans.y),
+                cv2.FONT_HERSHEY_COMPLEX,
+                0.4,
+                (0, 0, 255),
+            )
+            ans.mark_answer(colour_img, colour=(0, 0, 255), circle_thickness=-1)
+
+    assert np.array_equal(form.mark_all_answers(), colour_img)
+
+
+def test_render_review(form, tmp_path):
+    review_path = str(tmp_path / "review.jpg")
+    review_img = form.render_review(scale=0.5, path=review_path)
+    assert review_img.shape[:2] == (781, 1080)
+    assert cv2.imread(review_path).shape == review_img.shape
+
+    # only filled answers are marked
+    review_img = form.render_review()
+    filled_ans = form.find_answers()[1][0]
+    empty_ans = form.questions[0].answers[0]
+    assert tuple(review_img[filled_ans.y, filled_ans.x]) == (0, 0, 255)
+    assert tuple(review_img[empty_ans.y, empty_ans.x]) != (0, 0, 255)
+
+    # labels are rendered again when answers are changed and compiled again
+    label_mask = form.template.label_layer()[1]
+    empty_ans.value = "changed"
+    form.template.compile_answers()
+    assert not np.array_equal(form.template.label_layer()[1], label_mask)
+
+
+def test_iter_document(template_from_json, tmp_path, monkeypatch):
+    form_img = cv2.imread(OEE_FILLED_FORM)
+    tiff_path = str(tmp_path / "bundle.tiff")
+    cv2.imwritemulti(tiff_path, [form_img, form_img])
+
+    tracked = []
+    track_outer_box = img_processing.track_outer_box
+
+    def track(img, hint, *args, **kwargs):
+        tracked.append(hint)
+        return track_outer_box(img, hint, *args, **kwargs)
+
+    monkeypatch.setattr(img_processing, "track_outer_box", track)
+    forms = list(Form.iter_document(tiff_path, template_from_json))
+    assert [form.form_id for form in forms] == [f"{tiff_path}:0", f"{tiff_path}:1"]
+    assert forms[1].find_answers()[1][0].value == "val_20"
+    # outer box of the first page is tracked on the second page
+    assert len(tracked) == 1
+    assert np.array_equal(tracked[0], forms[0].corners)
+    assert np.array_equal(forms[1].corners, forms[0].corners)
+    assert np.array_equal(forms[1].img, forms[0].img)
+
+    # forms of all pages are scored with the same thread pool
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        threaded_forms = list(
+            Form.iter_document(
+                tiff_path, template_from_json, workers=2, executor=executor
+            )
+        )
+        assert all(form.executor is executor for form in threaded_forms)
+        assert np.array_equal(threaded_forms[1].fill_ratios, forms[1].fill_ratios)
+
+
+def test_form_from_path(template_from_json):
+    form = Form.from_path(OEE_FILLED_FORM, template_from_json)
+    assert form.img.shape == template_from_json.img.shape
+    assert form.find_answers()[1][0].value == "val_20"
+
+    reduced_form = Form.from_path(OEE_FILLED_FORM, template_from_json, 2)
+    assert reduced_form.img.shape == template_from_json.img.shape
+    assert reduced_form.find_answers()[1][0].value == "val_20"
+
+
+def test_form_pool(template_from_json, form):
+    pool = BufferPool()
+    img = cv2.imread(OEE_FILLED_FORM)
+    pooled_form = Form(img, template_from_json, pool=pool)
+    n_bytes = pool.nbytes
+    # processing a different page with the same pool does not change the
+    # first form, which is only scored afterwards
+    blank_form = Form(cv2.imread(OEE_TEMPLATE_JPG), template_from_json, pool=pool)
+    assert pool.nbytes == n_bytes
+    assert not np.shares_memory(blank_form.img, pooled_form.img)
+    assert np.array_equal(pooled_form.fill_ratios, form.fill_ratios)
+    assert pooled_form.find_answers() == form.find_answers()
+    assert blank_form.filled().all()
+
+
+def test_confidence(template_from_json, form):
+    confidence = form.confidence()
+    assert confidence["ambiguous"].shape == (2,)
+    # every answer is assigned to 2 questions so both have multiple marks
+    assert confidence["ambiguous"].all()
+    assert not confidence["blank"].any()
+    assert form.needs_review()
+
+    # split into a question with only answer 20 clearly filled and a blank one
+    answers = template_from_json.questions[0].answers
+    template_from_json.questions = [
+        Question(1, answers[:21], multiple=False),
+        Question(2, answers[21:52], multiple=False),
+    ]
+    template_from_json.compile_answers()
+    split_form = Form(cv2.imread(OEE_FILLED_FORM), template_from_json)
+    confidence = split_form.confidence()
+    assert confidence["margin"][0] > 0.9
+    assert not confidence["ambiguous"].any()
+    assert not confidence["partial"].any()
+    assert confidence["blank"].tolist() == [False, True]
+    assert not split_form.needs_review()
+    assert split_form.find_answers()[1][0].value == "val_20"
+
+
+def test_subpixel_fill_ratios(template_from_json, form):
+    hard_filled = form.filled()
+    template_from_json.refine_answer_centres()
+    subpixel_form = Form(cv2.imread(OEE_FILLED_FORM), template_from_json)
+    assert np.array_equal(subpixel_form.filled(), hard_filled)
+    assert np.abs(subpixel_form.fill_ratios - form.fill_ratios).max() < 0.05
+
+
+def test_register_local(template_from_json, form):
+    template = template_from_json
+    # blank printed form with the marks of the filled form erased
+    blank_img = form.img.copy()
+    img_processing.draw_circles(
+        blank_img, template.answer_coords[form.filled()], template.circle_radius, 0
+    )
+    template.reference_img = blank_img
+
+    # a different form with one more mark on each question, curled by a few
+    # pixels
+    other_img = form.img.copy()
+    extra_marks = template.answer_coords[[0, 400]]
+    img_processing.draw_circles(other_img, extra_marks, template.circle_radius, 255)
+    other_form = Form(cv2.imread(OEE_FILLED_FORM), template)
+    other_form.img = np.roll(other_img, (3, -2), axis=(0, 1))
+    assert not np.array_equal(other_form.filled(), form.filled())
+
+    offsets = other_form.register_local(workers=2)
+    assert offsets.tolist() == [[-2, 3], [-2, 3]]
+    expected_filled = form.filled()
+    expected_filled[[0, 400]] = True
+    assert np.array_equal(other_form.filled(), expected_filled)
+
+
+def test_register_local_without_reference(form):
+    with pytest.warns(UserWarning):
+        form.register_local()
+
+
+def test_workers_fill_ratios(template_from_json, form):
+    with Form(
+        cv2.imread(OEE_FILLED_FORM), template_from_json, workers=3
+    ) as threaded_form:
+        assert np.array_equal(threaded_form.fill_ratios, form.fill_ratios)
+        # thread pool is created once and kept for the form
+        executor = threaded_form.executor
+        assert isinstance(executor, ThreadPoolExecutor)
+    # the pool created by the form is shut down when it is closed
+    assert threaded_form.executor is None
+    with pytest.raises(RuntimeError):
+        executor.submit(int)
+
+    template_from_json.refine_answer_centres()
+    subpixel_form = Form(cv2.imread(OEE_FILLED_FORM), template_from_json)
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        for _ in range(2):
+            with Form.from_path(
+                OEE_FILLED_FORM,
+                template_from_json,
+                reduce_factor=1,
+                workers=3,
+                executor=executor,
+            ) as threaded_form:
+                assert np.array_equal(
+                    threaded_form.fill_ratios, subpixel_form.fill_ratios
+                )
+                assert threaded_form.executor is executor
+        # a shared executor is left running for the other forms
+        assert executor.submit(int).result() == 0
+
+
+def test_scaled_fill_ratios(template_from_json):
+    template_from_json.refine_answer_centres()
+    form = Form.from_path(OEE_FILLED_FORM, template_from_json, reduce_factor=2)
+    scaled_form = Form.from_path(
+        OEE_FILLED_FORM, template_from_json, reduce_factor=2, scale=0.5
+    )
+    # scored at half resolution without resizing up to the template size
+    assert scaled_form.img.shape == (781, 1080)
+    assert np.array_equal(scaled_form.filled(), form.filled())
+    assert np.abs(scaled_form.fill_ratios - form.fill_ratios).max() < 0.1
+    assert scaled_form.render_review().shape[:2] == template_from_json.img.shape
@@ -0,0 +1,34 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import formpy
+import pytest
+
+ROOT_DIR = Path(__file__).parents[1]
+
+
+def run_python(code: str) -> str:
+    """run code in a new python process so no modules are already imported"""
+    return subprocess.check_output(
+        [sys.executable, "-c", code], cwd=ROOT_DIR, text=True
+    ).strip()
+
+
+def test_import_without_opencv():
+    code = "import sys, formpy, formpy.utils.schema; print('cv2' in sys.modules)"
+    assert run_python(code) == "False"
+
+
+def test_lazy_attrs():
+    code = "import sys, formpy; formpy.Template; print('cv2' in sys.modules)"
+    assert run_python(code) == "True"
+
+    from formpy.form import Form
+    from formpy.template import Template
+
+    assert formpy.Form is Form
+    assert formpy.Template is Template
+    assert set(formpy.__all__) <= set(dir(formpy))
+    with pytest.raises(AttributeError):
+        formpy.NotAnAttribute
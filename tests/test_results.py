@@ -0,0 +1,34 @@
+import numpy as np
+from formpy.results import ResultStore
+
+
+def test_result_store_thresholds(form):
+    store = ResultStore.from_template(form.template)
+    store.append(form, "form_0")
+    assert store.ratios.shape == (1, 707)
+
+    assert store.answers() == [{1: ["val_20"], 2: ["val_402"]}]
+    # lower threshold for second question only
+    question_1 = store.question_ids == 1
+    question_2 = store.question_ids == 2
+    lower_filled = store.filled({2: 0.3})
+    assert lower_filled[:, question_1].sum() == store.filled()[:, question_1].sum()
+    assert lower_filled[:, question_2].sum() > store.filled()[:, question_2].sum()
+    assert np.array_equal(store.filled(0.8), form.filled(0.8)[None])
+    # answers exactly at the threshold are filled the same as on the form
+    assert store.filled(form.fill_ratios).all()
+    assert form.filled(form.fill_ratios).all()
+
+
+def test_result_store_save_load(form, tmp_path):
+    store = ResultStore.from_template(form.template)
+    store.append(form, "form_0")
+    store.append(form, "form_1")
+    store.save(tmp_path / "results.npz")
+
+    loaded_store = ResultStore.load(tmp_path / "results.npz")
+    assert loaded_store.form_ids == ["form_0", "form_1"]
+    assert loaded_store.multiple == store.multiple
+    assert np.array_equal(loaded_store.ratios, store.ratios)
+    assert loaded_store.ratios.dtype == form.fill_ratios.dtype
+    assert loaded_store.answers(0.5) == store.answers(0.5)
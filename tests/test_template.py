@@ -1,5 +1,11 @@
+import json
+
 import cv2
+import numpy as np
+import pytest
+from formpy.question import Question
 from formpy.template import Template
+from formpy.utils.scoring import weighted_fill_ratios
 
 from .paths import OEE_TEMPLATE_JPG, OEE_TEMPLATE_SIMPLE_JPG
 
@@ -80,3 +86,97 @@ def test_simple_template_from_img():
 
     assert template.questions[5].answers[4].x == 1619
     assert template.questions[2].answers[1].y == 465
+
+
+def test_question_bboxes(template_from_json):
+    template = template_from_json
+    question = template.questions[1]
+    x0, y0, x1, y1 = template.question_bboxes[1]
+    assert x0 == min(ans.x for ans in question.answers) - template.circle_radius
+    assert y1 == max(ans.y for ans in question.answers) + template.circle_radius + 1
+    assert np.array_equal(
+        template.question_bboxes, [qn.bbox for qn in template.questions]
+    )
+
+    # boxes are updated when answers are changed and compiled again
+    template.questions[0].answers[0].x -= 300
+    template.compile_answers()
+    assert template.question_bboxes[0][0] == 58 - 300
+    assert np.array_equal(template.question_bboxes[0], template.questions[0].bbox)
+    assert (
+        template.crop_questions(template.img)[0].shape[1]
+        == template.question_bboxes[0][2]
+    )
+    # questions use the compiled box instead of calculating it again
+    assert np.shares_memory(template.questions[0].bbox, template.question_bboxes)
+
+    # questions without answers have an empty box
+    template.questions.insert(1, Question(99, [], multiple=False))
+    template.compile_answers()
+    assert np.array_equal(template.question_bboxes[1], [0, 0, 0, 0])
+    assert template.questions[1].question_img(template.img).size == 0
+    assert np.array_equal(template.question_bboxes[2], template.questions[2].bbox)
+    assert template.question_bboxes[2][0] == x0
+    assert np.array_equal(Question(99, [], multiple=False).bbox, [0, 0, 0, 0])
+
+
+def test_crop_questions(template_from_json):
+    template = template_from_json
+    question_imgs = template.crop_questions(template.img)
+    assert len(question_imgs) == 2
+    for question, question_img in zip(template.questions, question_imgs):
+        assert question_img.base is template.img
+        assert np.array_equal(question_img, question.question_img(template.img))
+
+
+def test_decode_factor(template_from_json):
+    template = template_from_json
+    assert template.decode_factor() == 1
+    # forms scanned at 4x the template resolution
+    scan_shape = (template.scan_shape[0] * 4, template.scan_shape[1] * 4)
+    assert template.decode_factor(scan_shape) == 4
+    assert template.decode_factor(scan_shape, min_radius=30) == 2
+
+
+def test_refine_answer_centres(template_from_json):
+    template = template_from_json
+    template.refine_answer_centres()
+    offsets = template.answer_centres - template.answer_coords
+    assert np.abs(offsets).max() < 1.5
+    # fractional centres are found
+    assert np.any(offsets % 1 != 0)
+
+    origins, kernels = template.answer_kernels()
+    assert kernels.shape == (707, 33, 33)
+    assert template.answer_kernels() is template.answer_kernels()
+    # all answers are filled in on the template
+    assert weighted_fill_ratios(template.img, origins, kernels).min() > 0.95
+
+
+def test_template_to_json(template_from_json):
+    template = template_from_json
+    template.questions[0].answers[0].filled_threshold = 0.5
+    template.compile_answers()
+    template.refine_answer_centres()
+    template_dict = json.loads(template.to_json())
+    assert template_dict["version"] == 2
+
+    loaded = Template.from_dict(template_dict, OEE_TEMPLATE_JPG)
+    assert [qn.question_id for qn in loaded.questions] == [1, 2]
+    assert [qn.multiple for qn in loaded.questions] == [
+        qn.multiple for qn in template.questions
+    ]
+    assert [ans.value for ans in loaded.answers] == [
+        ans.value for ans in template.answers
+    ]
+    assert np.array_equal(loaded.answer_coords, template.answer_coords)
+    assert np.array_equal(loaded.answer_thresholds, template.answer_thresholds)
+    assert loaded.subpixel
+    assert np.array_equal(loaded.answer_centres, template.answer_centres)
+
+
+def test_template_unsupported_version(template_from_json):
+    template_dict = template_from_json.to_dict()
+    template_dict["version"] = 3
+    with pytest.raises(ValueError):
+        Template.from_dict(template_dict, OEE_TEMPLATE_JPG)
@@ -1,9 +1,22 @@
 import cv2
 import numpy as np
-from formpy.utils.img_processing import align_page, get_outer_box, process_img
+import pytest
+from formpy.utils.buffers import BufferPool
+from formpy.utils.documents import iter_pages, page_count, read_img
+from formpy.utils.img_processing import (
+    align_page,
+    detect_orientation,
+    get_fiducial_corners,
+    get_outer_box,
+    local_offsets,
+    process_img,
+    thresh_img,
+    track_outer_box,
+)
+from formpy.utils.scoring import question_confidence
 from formpy.utils.template_definition import find_spots
 
-from .paths import OEE_TEMPLATE_JPG, OEE_TEMPLATE_SIMPLE_JPG
+from .paths import OEE_FILLED_FORM, OEE_TEMPLATE_JPG, OEE_TEMPLATE_SIMPLE_JPG
 
 
 def test_align_form():
@@ -29,3 +42,167 @@ def test_find_spots():
     oee_spots = find_spots(oee_img, max_radius=20, min_radius=10)
     assert len(oee_spots) == 707
     assert len(simple_spots) == 64
+
+
+def test_track_outer_box():
+    img = thresh_img(cv2.imread(OEE_FILLED_FORM))
+    pts = get_outer_box(img)
+    # page shifted slightly in the feeder
+    shifted_img = np.roll(img, (7, -5), axis=(0, 1))
+    tracked_pts = track_outer_box(shifted_img, pts)
+    assert np.array_equal(tracked_pts, pts + np.array([-5, 7], dtype="float32"))
+
+
+def test_track_outer_box_fallback():
+    img = thresh_img(cv2.imread(OEE_FILLED_FORM))
+    pts = get_outer_box(img)
+    assert track_outer_box(np.zeros_like(img), pts) is None
+    # far away hint falls back to full detection
+    bad_hint = pts + 200
+    assert np.array_equal(get_outer_box(img, hint=bad_hint), pts)
+
+
+def test_fiducial_corners(fiducial_page):
+    pts = get_fiducial_corners(fiducial_page)
+    expected_pts = np.array(
+        [[40.0, 40.0], [1359.0, 40.0], [1359.0, 959.0], [40.0, 959.0]],
+        dtype="float32",
+    )
+    assert np.array_equal(pts, expected_pts)
+
+
+def test_fiducial_align_rotated(fiducial_page):
+    aligned_img = align_page(fiducial_page, alignment="fiducial")
+    for rotation in (cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_180):
+        rotated_img = cv2.rotate(fiducial_page, rotation)
+        aligned_rotated_img = align_page(rotated_img, alignment="fiducial")
+        assert np.array_equal(aligned_rotated_img, aligned_img)
+
+
+def test_detect_orientation():
+    img = cv2.imread(OEE_FILLED_FORM, cv2.IMREAD_GRAYSCALE)
+    pts = get_outer_box(thresh_img(img))
+    assert detect_orientation(thresh_img(img), pts) == 0
+
+    # solid marker just inside top left corner of the outer box
+    x, y = pts[0].astype(int)
+    cv2.rectangle(img, (x + 15, y + 10), (x + 100, y + 70), 0, -1)
+    upright_img = process_img(img, detect_rotation=True)
+
+    for quarter_turns, rotation in enumerate(
+        (cv2.ROTATE_90_CLOCKWISE, cv2.ROTATE_180, cv2.ROTATE_90_COUNTERCLOCKWISE),
+        start=1,
+    ):
+        rotated_img = thresh_img(cv2.rotate(img, rotation))
+        rotated_pts = get_outer_box(rotated_img)
+        assert detect_orientation(rotated_img, rotated_pts) == quarter_turns
+
+        aligned_img = align_page(rotated_img, rotated_pts, detect_rotation=True)
+        assert np.array_equal(aligned_img, upright_img)
+
+
+def test_iter_pages_tiff(tmp_path):
+    template_img = cv2.imread(OEE_TEMPLATE_JPG, cv2.IMREAD_GRAYSCALE)
+    form_img = cv2.imread(OEE_FILLED_FORM, cv2.IMREAD_GRAYSCALE)
+    tiff_path = str(tmp_path / "bundle.tiff")
+    cv2.imwritemulti(tiff_path, [template_img, form_img])
+
+    assert page_count(tiff_path) == 2
+    pages = list(iter_pages(tiff_path))
+    assert [page_idx for page_idx, _ in pages] == [0, 1]
+    assert np.array_equal(pages[1][1], form_img)
+
+    reduced_pages = list(iter_pages(tiff_path, reduce_factor=2))
+    assert reduced_pages[1][1].shape == (828, 1169)
+
+
+def test_iter_pages_pdf(tmp_path):
+    pymupdf = pytest.importorskip("fitz")
+    pdf_path = str(tmp_path / "bundle.pdf")
+    with pymupdf.open() as doc:
+        for _ in range(3):
+            page = doc.new_page(width=842, height=595)
+            page.insert_image(page.rect, filename=OEE_FILLED_FORM)
+        doc.save(pdf_path)
+
+    assert page_count(pdf_path) == 3
+    for page_idx, img in iter_pages(pdf_path, dpi=72):
+        assert img.shape == (595, 842)
+
+
+def test_read_img_reduced():
+    img = read_img(OEE_FILLED_FORM)
+    assert img.shape == (1656, 2339)
+    assert read_img(OEE_FILLED_FORM, reduce_factor=4).shape == (414, 585)
+    with pytest.raises(ValueError):
+        read_img(OEE_FILLED_FORM, reduce_factor=3)
+
+
+def test_buffer_pool():
+    pool = BufferPool()
+    buf = pool.get("thresh", (100, 200))
+    # smaller requests reuse the same buffer
+    smaller_buf = pool.get("thresh", (99, 198))
+    assert smaller_buf.shape == (99, 198)
+    assert np.shares_memory(buf, smaller_buf)
+    # larger requests replace the buffer
+    larger_buf = pool.get("thresh", (99, 201))
+    assert not np.shares_memory(buf, larger_buf)
+    assert np.shares_memory(larger_buf, pool.get("thresh", (100, 200)))
+
+
+def test_process_img_pool():
+    img = cv2.imread(OEE_FILLED_FORM)
+    pool = BufferPool()
+    pooled_img = process_img(img, pool=pool)
+    assert np.array_equal(pooled_img, process_img(img))
+
+    n_bytes = pool.nbytes
+    assert np.shares_memory(process_img(img, pool=pool), pooled_img)
+    assert pool.nbytes == n_bytes
+
+
+def test_question_confidence():
+    question_ids = np.array([1, 1, 1, 2, 2, 3, 3])
+    thresholds = np.full(7, 0.8)
+    fill_ratios = np.array(
+        [
+            # clear single answer, two marks, blank
+            [0.95, 0.10, 0.05, 1.0, 0.9, 0.0, 0.1],
+            # nearly filled answer, clear single answer, half filled answer
+            [0.75, 0.10, 0.05, 1.0, 0.1, 0.0, 0.5],
+        ]
+    )
+    confidence = question_confidence(
+        fill_ratios, question_ids, thresholds, [False, False, True], min_margin=0.1
+    )
+    assert np.allclose(confidence["margin"][0], [0.85, 0.1, 0.1])
+    assert confidence["partial"].tolist() == [
+        [False, False, False],
+        [True, False, True],
+    ]
+    assert confidence["ambiguous"].tolist() == [
+        [False, True, False],
+        [True, False, True],
+    ]
+    assert confidence["blank"].tolist() == [[False, False, True], [True, False, True]]
+
+
+def test_local_offsets():
+    img = process_img(cv2.imread(OEE_FILLED_FORM))
+    shifted_img = np.roll(img, (-4, 5), axis=(0, 1))
+    bboxes = np.array([[100, 100, 600, 500], [1200, 800, 1800, 1400]])
+    assert local_offsets(shifted_img, img, bboxes).tolist() == [[5, -4], [5, -4]]
+    # blank reference does not match
+    blank_img = np.zeros_like(img)
+    assert local_offsets(shifted_img, blank_img, bboxes).tolist() == [[0, 0], [0, 0]]
+
+
+def test_process_img_hint():
+    img = cv2.imread(OEE_FILLED_FORM)
+    aligned_img, pts = process_img(img, return_corners=True)
+    assert np.array_equal(pts, get_outer_box(thresh_img(img)))
+
+    tracked_img, tracked_pts = process_img(img, hint=pts, return_corners=True)
+    assert np.array_equal(tracked_pts, pts)
+    assert np.array_equal(tracked_img, aligned_img)